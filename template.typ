@@ -1,9 +1,17 @@
 #import "@preview/cades:0.3.1": qr-code
 
+// Page furniture shared by every template. build_mega_templates.py also
+// compiles `instructions-qr` to an SVG once and passes it as `qr-code-svg`.
+#let instructions-url = "https://github.com/ophwug/mount-install-templates?tab=readme-ov-file#how-to-use"
+#let instructions-qr = qr-code(instructions-url, width: 2cm)
+
 #let template(
   mount-name: "Mount",
   footprint-label: "Mount",
   svg-file: "dummy.svg",
+  // Exact footprint size from the normalize_svg.py sidecar; measured when none.
+  svg-width: none,
+  svg-height: none,
   clearance-offset: 60mm,
   secondary-clearance-offset: none,
   repo-url: none,
@@ -14,18 +22,29 @@
   min-radius: 300mm,
   top-padding: 4cm,
   custom-clearance-svg: none,
+  // Pre-clipped arcs from build_mega_templates.py; drawn as circles when none.
+  clearance-arcs-svg: none,
+  // Pre-rendered furniture from build_mega_templates.py: the 5mm page grid
+  // for this paper size and the instructions QR code. Built in Typst when none.
+  page-grid-svg: none,
+  qr-code-svg: none,
   feedback-community-url: "https://discord.comma.ai",
   feedback-community-label: "discord.comma.ai",
   feedback-community-channel: "#installation-help",
 ) = {
-  let page-grid = tiling(size: (5mm, 5mm), {
-    rect(width: 5mm, height: 5mm, stroke: (thickness: 0.1pt, paint: black))
-  })
+  let page-background = if page-grid-svg != none {
+    image(page-grid-svg, width: 100%, height: 100%)
+  } else {
+    let page-grid = tiling(size: (5mm, 5mm), {
+      rect(width: 5mm, height: 5mm, stroke: (thickness: 0.1pt, paint: black))
+    })
+    rect(width: 100%, height: 100%, fill: page-grid)
+  }
   set page(
     paper: paper-size,
     margin: 1cm,
     flipped: true,
-    background: place(top + left, rect(width: 100%, height: 100%, fill: page-grid)),
+    background: place(top + left, page-background),
   )
   set text(font: "DejaVu Sans Mono", size: 12pt)
 
@@ -40,7 +59,11 @@
     #context {
       // Load image to get dimensions
       let img = image(svg-file)
-      let size = measure(img)
+      let size = if svg-width != none and svg-height != none {
+        (width: svg-width, height: svg-height)
+      } else {
+        measure(img)
+      }
 
       // Layout Constants
       // 100% width might be constrained by margin, which is fine.
@@ -175,6 +198,9 @@
           // We want trace bottom (at SVG bottom - 5mm) to align with line-y.
           // So SVG bottom should be at line-y + 5mm.
           place(top + center, dy: line-y - svg-size.height + 5mm, svg-data)
+        } else if clearance-arcs-svg != none {
+          // Already clipped to the strip above the reference line.
+          place(top + center, image(clearance-arcs-svg, width: 100%))
         } else [
           #for r in radii [
             // Circle Placement
@@ -260,10 +286,12 @@
             #v(0.1cm)
             #text(size: 10pt)[Instructions are at the QR code]
 
-            #let instructions-url = "https://github.com/ophwug/mount-install-templates?tab=readme-ov-file#how-to-use"
-
             #v(0.1cm)
-            #qr-code(instructions-url, width: 2cm)
+            #if qr-code-svg != none {
+              image(qr-code-svg, width: 2cm)
+            } else {
+              instructions-qr
+            }
 
             #v(0.1cm)
             #link(instructions-url)[#text(size: 7pt)[github.com/ophwug/mount-install-templates]]
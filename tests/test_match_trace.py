@@ -0,0 +1,42 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip("cv2")
+
+import match_trace  # noqa: E402
+from refine_trace import parse_svg_path_points  # noqa: E402
+
+# offsets.svg starts with the refined housing trace.
+TRACE = Path(__file__).resolve().parents[1] / "vehicles" / "2020_hyundai_santa_fe" / "gen" / "offsets.svg"
+
+
+def distance(a, b):
+    return float(np.linalg.norm(np.subtract(match_trace.fourier_descriptor(a), match_trace.fourier_descriptor(b))))
+
+
+def rotated(points, degrees):
+    angle = np.radians(degrees)
+    rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+    return points @ rotation.T
+
+
+@pytest.fixture
+def trace():
+    return parse_svg_path_points(TRACE)
+
+
+def test_reversed_trace_matches_itself(trace):
+    assert distance(trace, trace[::-1]) < 1e-2
+
+
+def test_rotated_scaled_and_restarted_trace_matches_itself(trace):
+    moved = np.roll(rotated(trace, 37.0) * 2.5 + (40.0, -15.0), 101, axis=0)
+    assert distance(trace, moved) < 5e-2
+
+
+def test_other_shape_is_further_than_reversed_copy(trace):
+    angles = np.linspace(0, 2 * np.pi, 200, endpoint=False)
+    ellipse = np.column_stack((100 * np.cos(angles), 40 * np.sin(angles)))
+    assert distance(trace, ellipse) > 10 * distance(trace, trace[::-1])
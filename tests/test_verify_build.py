@@ -0,0 +1,179 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+pytest.importorskip("google.genai")
+pytest.importorskip("dotenv")
+
+import google.auth  # noqa: E402
+from google.oauth2.credentials import Credentials  # noqa: E402
+
+import verify_build  # noqa: E402
+
+
+class FakeModels:
+    """Stands in for client.aio.models, recording concurrency and calls."""
+
+    def __init__(self, failures=None, empty=()):
+        self.failures = dict(failures or {})
+        self.empty = set(empty)
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def generate_content(self, model, contents):
+        image, _prompt = contents
+        name = image.filename
+        self.calls.append(name)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await real_sleep(0.01)
+            if self.failures.get(name, 0) > 0:
+                self.failures[name] -= 1
+                raise RuntimeError("429 resource exhausted")
+            if name in self.empty:
+                return SimpleNamespace(text=None)
+            return SimpleNamespace(text="1. YES\nPASS")
+        finally:
+            self.active -= 1
+
+
+real_sleep = asyncio.sleep
+
+
+def fake_client(models):
+    return SimpleNamespace(aio=SimpleNamespace(models=models))
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for index in range(6):
+        path = tmp_path / f"page_{index}.png"
+        Image.new("RGB", (8, 8), (index, 0, 0)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    recorded = []
+
+    async def sleep(delay):
+        recorded.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr(verify_build.asyncio, "sleep", sleep)
+    monkeypatch.setattr(verify_build.random, "uniform", lambda low, high: 0.0)
+    return recorded
+
+
+def test_concurrency_backoff_and_cache(tmp_path, images, delays, monkeypatch):
+    monkeypatch.setattr(verify_build, "MAX_CONCURRENCY", 2)
+    db = verify_build.open_cache(str(tmp_path / "cache" / "verify.sqlite"))
+    models = FakeModels(failures={images[0]: 2})
+
+    failed = asyncio.run(verify_build.verify_all(fake_client(models), db, images, refresh=False))
+
+    assert failed == []
+    assert models.max_active == 2
+    assert len(models.calls) == len(images) + 2
+    assert delays == [2, 4]
+
+    models = FakeModels()
+    failed = asyncio.run(verify_build.verify_all(fake_client(models), db, images, refresh=False))
+
+    assert failed == []
+    assert models.calls == []
+
+
+def test_empty_response_fails_only_that_image(tmp_path, images, delays):
+    db = verify_build.open_cache(str(tmp_path / "verify.sqlite"))
+    models = FakeModels(empty={images[1]})
+
+    failed = asyncio.run(verify_build.verify_all(fake_client(models), db, images, refresh=False))
+
+    assert failed == [images[1]]
+    # The error is not cached, so only that image is submitted again.
+    models = FakeModels()
+    asyncio.run(verify_build.verify_all(fake_client(models), db, images, refresh=False))
+    assert models.calls == [images[1]]
+
+
+class StubGemini(BaseHTTPRequestHandler):
+    """Answers Vertex generateContent calls; the first `rate_limited` get 429."""
+
+    lock = threading.Lock()
+    requests = []
+    active = 0
+    max_active = 0
+    rate_limited = 0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        cls = type(self)
+        with cls.lock:
+            cls.requests.append(self.path)
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+            limited = cls.rate_limited > 0
+            cls.rate_limited -= limited
+        threading.Event().wait(0.05)
+        with cls.lock:
+            cls.active -= 1
+        if limited:
+            body = {"error": {"code": 429, "message": "Resource exhausted", "status": "RESOURCE_EXHAUSTED"}}
+            status = 429
+        else:
+            body = {"candidates": [{"content": {"role": "model", "parts": [{"text": "All YES.\nPASS"}]}}]}
+            status = 200
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    StubGemini.requests = []
+    StubGemini.active = StubGemini.max_active = 0
+    StubGemini.rate_limited = 2
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGemini)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("VERIFY_BASE_URL", f"http://127.0.0.1:{server.server_port}")
+    monkeypatch.setenv("GOOGLE_CLOUD_PROJECT", "stub-project")
+    monkeypatch.setenv("GOOGLE_GENAI_USE_VERTEXAI", "True")
+    # A fixed token needs no refresh, so no real Google credentials are used.
+    monkeypatch.setattr(google.auth, "default", lambda *args, **kwargs: (Credentials(token="stub"), "stub-project"))
+    yield StubGemini
+    server.shutdown()
+    server.server_close()
+
+
+def test_main_against_stub_server(tmp_path, images, delays, stub_server, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(verify_build, "MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(verify_build.sys, "argv", ["verify_build.py", *images])
+
+    verify_build.main()
+
+    assert "All checks PASSED." in capsys.readouterr().out
+    assert len(stub_server.requests) == len(images) + 2
+    assert all(path.endswith(f"/models/{verify_build.MODEL_ID}:generateContent") for path in stub_server.requests)
+    assert stub_server.max_active == 2
+    assert sorted(delays) == [2, 2]
+
+    stub_server.requests.clear()
+    verify_build.main()
+    assert stub_server.requests == []
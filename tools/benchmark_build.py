@@ -4,7 +4,9 @@ from __future__ import annotations
 import argparse
 import os
 import shutil
+import statistics
 import subprocess
+import sys
 import time
 from pathlib import Path
 
@@ -12,16 +14,20 @@ import build_mega_templates
 
 
 ROOT = Path(__file__).resolve().parents[1]
+# Make regenerates build/plan.mk through the planner, so its startup cost is
+# paid on every invocation that touches the plan.
+PLAN_BUDGET_SECONDS = 0.5
+PLAN_RUNS = 5
 
 
-def run(cmd: list[str]) -> None:
+def run(cmd: list[str], cwd: Path = ROOT) -> None:
     print("+ " + " ".join(cmd), flush=True)
-    subprocess.run(cmd, cwd=ROOT, check=True)
+    subprocess.run(cmd, cwd=cwd, check=True)
 
 
-def timed(cmd: list[str]) -> float:
+def timed(cmd: list[str], cwd: Path = ROOT) -> float:
     start = time.perf_counter()
-    run(cmd)
+    run(cmd, cwd)
     return time.perf_counter() - start
 
 
@@ -62,7 +68,27 @@ def verify_outputs(scope: str) -> int:
     return len(outputs)
 
 
-def prebuild_shared_prereqs(scope: str, jobs: int) -> None:
+def unified_command(scope: str, typst: str, jobs: int) -> list[str]:
+    """Build every group in the scope from one Typst document, as UNIFIED=1 does.
+
+    The single compile gets the same Typst binary as the make runs and `jobs`
+    Typst threads, so it uses no more of the machine than ``make -j jobs``.
+    """
+    cmd = [
+        sys.executable,
+        "tools/build_mega_templates.py",
+        "--unified",
+        "--typst",
+        typst,
+        "--typst-jobs",
+        str(jobs),
+    ]
+    for group in groups_for_scope(scope):
+        cmd.extend(["--group", group])
+    return cmd
+
+
+def prebuild_shared_prereqs(scope: str, jobs: int, cwd: Path = ROOT) -> None:
     prereqs = [
         "build/c3_mount.svg",
         "build/c3x_mount.svg",
@@ -77,39 +103,95 @@ def prebuild_shared_prereqs(scope: str, jobs: int) -> None:
                 "vehicles/2020_hyundai_santa_fe/gen/offsets.svg",
             ]
         )
-    run(["make", "-j", str(jobs), *prereqs])
+    run(["make", "-j", str(jobs), *prereqs], cwd)
+
+
+def measure_plan(scope: str) -> int:
+    cmd = [sys.executable, "tools/build_mega_templates.py", "--list-outputs"]
+    for group in groups_for_scope(scope):
+        cmd.extend(["--group", group])
+
+    samples = []
+    for _ in range(PLAN_RUNS):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+
+    heavy = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, build_mega_templates as b; b.expected_outputs(list(b.GROUPS)); "
+            "print(' '.join(m for m in ('pypdf', 'PIL') if m in sys.modules))",
+        ],
+        cwd=ROOT / "tools",
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.strip()
+
+    median = statistics.median(samples)
+    print(f"scope={scope}")
+    print(f"plan_min_seconds={min(samples):.3f}")
+    print(f"plan_median_seconds={median:.3f}")
+    print(f"plan_budget_seconds={PLAN_BUDGET_SECONDS:.3f}")
+    print(f"plan_heavy_imports={heavy or 'none'}")
+    if heavy:
+        print(f"planner imported heavy modules: {heavy}", file=sys.stderr)
+        return 1
+    if median > PLAN_BUDGET_SECONDS:
+        print(f"planner exceeded budget: {median:.3f}s > {PLAN_BUDGET_SECONDS:.3f}s", file=sys.stderr)
+        return 1
+    return 0
 
 
 def parse_args() -> argparse.Namespace:
-    parser = argparse.ArgumentParser(description="Compare individual vs mega Typst builds.")
+    parser = argparse.ArgumentParser(description="Compare individual, per-group mega and unified Typst builds.")
     parser.add_argument("--scope", choices=("universal", "all"), default="universal")
     parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--typst", default="typst")
+    parser.add_argument(
+        "--plan-only",
+        action="store_true",
+        help="Only time the output planner against its startup budget.",
+    )
     return parser.parse_args()
 
 
 def main() -> int:
     args = parse_args()
+    if args.plan_only:
+        return measure_plan(args.scope)
     target = make_target_for_scope(args.scope)
 
     prebuild_shared_prereqs(args.scope, args.jobs)
 
     remove_render_outputs(args.scope)
-    old_seconds = timed(["make", "-j", str(args.jobs), "INDIVIDUAL=1", target])
+    old_seconds = timed(["make", "-j", str(args.jobs), f"TYPST={args.typst}", "INDIVIDUAL=1", target])
     old_count = verify_outputs(args.scope)
 
     remove_render_outputs(args.scope)
-    new_seconds = timed(["make", "-j", str(args.jobs), target])
+    new_seconds = timed(["make", "-j", str(args.jobs), f"TYPST={args.typst}", target])
     new_count = verify_outputs(args.scope)
 
-    if old_count != new_count:
-        raise RuntimeError(f"old output count {old_count} != new output count {new_count}")
+    remove_render_outputs(args.scope)
+    unified_seconds = timed(unified_command(args.scope, args.typst, args.jobs))
+    unified_count = verify_outputs(args.scope)
+
+    if len({old_count, new_count, unified_count}) != 1:
+        raise RuntimeError(
+            f"output counts differ: individual={old_count} mega={new_count} unified={unified_count}"
+        )
 
     speedup = old_seconds / new_seconds if new_seconds > 0 else float("inf")
+    unified_speedup = new_seconds / unified_seconds if unified_seconds > 0 else float("inf")
     print(f"scope={args.scope}")
     print(f"jobs={args.jobs}")
     print(f"old_individual_seconds={old_seconds:.3f}")
     print(f"new_mega_seconds={new_seconds:.3f}")
     print(f"speedup={speedup:.2f}x")
+    print(f"unified_seconds={unified_seconds:.3f}")
+    print(f"unified_vs_mega={unified_speedup:.2f}x")
     print(f"outputs_checked={new_count}")
     return 0
 
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+import orient_stl
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "tools" / "vehicle_specific"))
+
+import generate_offsets  # noqa: E402
+import process_annotation  # noqa: E402
+import refine_trace  # noqa: E402
+
+
+RESULTS_PATH = ROOT / "build" / "benchmark_geometry.json"
+# Input sizes per benchmark: STL triangles, trace vertices, scan width in px.
+# Results record the actual triangle count and scan pixel count.
+SIZES = {
+    "orient_stl": (4_000, 64_000, 256_000),
+    "refine_trace": (100, 1_000, 10_000),
+    "generate_offsets": (100, 1_000, 10_000, 100_000),
+    "process_annotation": (1_000, 2_000, 4_000, 8_000),
+}
+QUICK_SIZES = {
+    "orient_stl": (1_000, 4_000, 16_000),
+    "refine_trace": (100, 400, 1_600),
+    "generate_offsets": (100, 1_000, 10_000),
+    "process_annotation": (500, 1_000, 2_000),
+}
+# A regression is flagged when a case gets this much slower than the
+# baseline, or its log-log scaling exponent grows by more than this.
+MAX_SLOWDOWN = 1.5
+MAX_EXPONENT_GROWTH = 0.3
+# Below this, timer noise dominates and slowdowns are not reported.
+MIN_COMPARABLE_SECONDS = 0.005
+
+
+@dataclass(frozen=True)
+class Case:
+    size: int
+    seconds: float
+    peak_bytes: int
+
+
+def synthetic_stl(path: Path, triangles: int) -> int:
+    """Write a binary STL of a flat-bottomed, mount-like puck.
+
+    Like a real mount, extra triangles add surface detail rather than hull
+    vertices: a 64-section cylinder is subdivided until it has at least
+    `triangles` faces. Returns the actual triangle count.
+    """
+    import trimesh
+
+    mesh = trimesh.creation.cylinder(radius=40.0, height=8.0, sections=64)
+    mesh.apply_scale((1.0, 0.6, 1.0))
+    while len(mesh.faces) < triangles:
+        mesh = mesh.subdivide()
+    path.write_bytes(mesh.export(file_type="stl"))
+    return len(mesh.faces)
+
+
+def synthetic_outline(vertices: int, seed: int = 0) -> np.ndarray:
+    """Return a noisy camera-housing-like outline in millimetres (y grows down)."""
+    rng = np.random.default_rng(seed)
+    angles = np.linspace(0.0, 2 * np.pi, vertices, endpoint=False)
+    # A squarish superellipse, wider than tall, with a little scan noise.
+    cos, sin = np.cos(angles), np.sin(angles)
+    x = 45.0 * np.sign(cos) * np.abs(cos) ** 0.5
+    y = 25.0 * np.sign(sin) * np.abs(sin) ** 0.5
+    noise = rng.normal(0.0, 0.05, size=(vertices, 2))
+    return np.column_stack((x, y)) + noise + (100.0, 80.0)
+
+
+def synthetic_trace(path: Path, vertices: int) -> None:
+    refine_trace.write_svg(synthetic_outline(vertices), str(path))
+
+
+def synthetic_scan(width: int) -> np.ndarray:
+    """Return an annotated BGR scan with a cyan card and a magenta trace."""
+    import cv2
+
+    height = width * 3 // 4
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    pixels_per_mm = width / 300.0
+    card = ((width * 0.25, height * 0.7), (85.60 * pixels_per_mm, 53.98 * pixels_per_mm), 3.0)
+    cv2.fillPoly(image, [cv2.boxPoints(card).astype(np.int32)], (255, 255, 0))
+    outline = synthetic_outline(2_000) * pixels_per_mm
+    thickness = max(2, width // 500)
+    cv2.polylines(image, [outline.astype(np.int32)], True, (255, 0, 255), thickness)
+    return image
+
+
+def measure(func: Callable[[], object], repeats: int) -> tuple[float, int]:
+    """Return (best wall time, peak traced allocation) for `func`.
+
+    Timing runs without tracemalloc, whose hooks slow allocation-heavy code;
+    one extra traced run measures the Python and NumPy heap peak. OpenCV's
+    native buffers are not traced.
+    """
+    seconds = math.inf
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            seconds = min(seconds, time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            func()
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return seconds, peak
+
+
+def bench_orient_stl(scratch: Path, size: int, repeats: int) -> tuple[int, float, int]:
+    source = scratch / f"synthetic_{size}.stl"
+    triangles = synthetic_stl(source, size)
+    output = scratch / "oriented.stl"
+    seconds, peak = measure(lambda: orient_stl.orient_largest_face_down(str(source), str(output)), repeats)
+    return triangles, seconds, peak
+
+
+def bench_refine_trace(scratch: Path, size: int, repeats: int) -> tuple[int, float, int]:
+    points = synthetic_outline(size)
+    return size, *measure(lambda: refine_trace.symmetrize_trace(points), repeats)
+
+
+def bench_generate_offsets(scratch: Path, size: int, repeats: int) -> tuple[int, float, int]:
+    trace = scratch / f"trace_{size}.svg"
+    synthetic_trace(trace, size)
+    output = scratch / "offsets.svg"
+
+    def run() -> None:
+        points = generate_offsets.parse_svg_path_points(str(trace))
+        generate_offsets.write_svg_offsets(points, [], str(output))
+
+    return size, *measure(run, repeats)
+
+
+def bench_process_annotation(scratch: Path, size: int, repeats: int) -> tuple[int, float, int]:
+    image = synthetic_scan(size)
+    # Report pixels rather than width so a linear-time pass has exponent ~1.
+    return image.shape[0] * image.shape[1], *measure(lambda: process_annotation.extract_trace(image), repeats)
+
+
+# Each benchmark returns (actual input size, best seconds, peak traced bytes).
+BENCHMARKS: dict[str, Callable[[Path, int, int], tuple[int, float, int]]] = {
+    "orient_stl": bench_orient_stl,
+    "refine_trace": bench_refine_trace,
+    "generate_offsets": bench_generate_offsets,
+    "process_annotation": bench_process_annotation,
+}
+
+
+def scaling_exponent(cases: list[Case]) -> float | None:
+    """Slope of log(time) against log(size); ~1 is linear, ~2 quadratic."""
+    if len(cases) < 2:
+        return None
+    sizes = np.log([case.size for case in cases])
+    seconds = np.log([max(case.seconds, 1e-9) for case in cases])
+    return float(np.polyfit(sizes, seconds, 1)[0])
+
+
+def compare(results: dict, baseline: dict, max_slowdown: float) -> list[str]:
+    problems = []
+    for name, entry in results.items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            continue
+        before = {case["size"]: case for case in previous["cases"]}
+        for case in entry["cases"]:
+            old = before.get(case["size"])
+            if old is None or old["seconds"] < MIN_COMPARABLE_SECONDS:
+                continue
+            if case["seconds"] > old["seconds"] * max_slowdown:
+                problems.append(
+                    f"{name} size={case['size']} seconds={case['seconds']:.4f} "
+                    f"baseline={old['seconds']:.4f}"
+                )
+        if entry["exponent"] is not None and previous.get("exponent") is not None:
+            if entry["exponent"] > previous["exponent"] + MAX_EXPONENT_GROWTH:
+                problems.append(
+                    f"{name} exponent={entry['exponent']:.2f} baseline={previous['exponent']:.2f}"
+                )
+    return problems
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the Python geometry tools on synthetic inputs of increasing size."
+    )
+    parser.add_argument(
+        "--only",
+        action="append",
+        choices=tuple(BENCHMARKS),
+        help="Benchmark to run. May be repeated; defaults to all.",
+    )
+    parser.add_argument("--quick", action="store_true", help="Use smaller input sizes.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH)
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        help="Earlier --output JSON; exit non-zero if any case regressed against it.",
+    )
+    parser.add_argument("--max-slowdown", type=float, default=MAX_SLOWDOWN)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    sizes = QUICK_SIZES if args.quick else SIZES
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        for name in args.only or BENCHMARKS:
+            cases = []
+            for size in sizes[name]:
+                size, seconds, peak = BENCHMARKS[name](Path(scratch), size, args.repeats)
+                cases.append(Case(size, seconds, peak))
+                print(f"benchmark={name} size={size} seconds={seconds:.4f} peak_mb={peak / 1e6:.1f}")
+            exponent = scaling_exponent(cases)
+            if exponent is not None:
+                print(f"benchmark={name} exponent={exponent:.2f}")
+            results[name] = {
+                "exponent": exponent,
+                "cases": [
+                    {"size": case.size, "seconds": round(case.seconds, 6), "peak_bytes": case.peak_bytes}
+                    for case in cases
+                ],
+            }
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps({"quick": args.quick, "benchmarks": results}, indent=2) + "\n")
+    print(f"results={args.output}")
+
+    if args.baseline is not None:
+        problems = compare(results, json.loads(args.baseline.read_text()), args.max_slowdown)
+        for problem in problems:
+            print(f"regression: {problem}", file=sys.stderr)
+        if problems:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import benchmark_build
+
+
+ROOT = benchmark_build.ROOT
+HISTORY_PATH = ROOT / "build" / "perf_history.json"
+HISTORY_VERSION = 1
+# A revision counts as regressed when its build is this much slower, or its
+# rendered outputs this much larger, than the known-good revision.
+MAX_SLOWDOWN = 1.2
+MAX_SIZE_GROWTH = 1.05
+RENDERED_SUFFIXES = (".pdf", ".png")
+
+
+@dataclass(frozen=True)
+class Commit:
+    sha: str
+    subject: str
+
+    @property
+    def short(self) -> str:
+        return self.sha[:10]
+
+
+def git(*args: str) -> str:
+    return subprocess.check_output(["git", *args], cwd=ROOT, text=True).strip()
+
+
+def commit_range(good: str, bad: str) -> list[Commit]:
+    """Return `good` followed by the first-parent commits up to and including `bad`."""
+    shas = [git("rev-parse", f"{good}^{{commit}}")]
+    shas += git("rev-list", "--first-parent", "--reverse", f"{good}..{bad}").split()
+    return [Commit(sha, git("log", "-1", "--format=%s", sha)) for sha in shas]
+
+
+def load_history(path: Path) -> dict[str, dict]:
+    if not path.exists():
+        return {}
+    data = json.loads(path.read_text())
+    if data.get("version") != HISTORY_VERSION:
+        return {}
+    return data.get("results", {})
+
+
+def save_history(path: Path, results: dict[str, dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"version": HISTORY_VERSION, "results": results}, indent=2, sort_keys=True) + "\n")
+
+
+def history_key(commit: Commit, scope: str, jobs: int) -> str:
+    # Timings are only comparable on the same machine and job count.
+    return f"{commit.sha}:{scope}:j{jobs}:{platform.node()}"
+
+
+def link_hardware(worktree: Path) -> None:
+    """Point the worktree's hardware submodule at this checkout's.
+
+    This avoids cloning the submodule for every revision and keeps the mount
+    sources fixed, so only the build code differs between measurements.
+    """
+    target = worktree / "hardware"
+    if target.is_dir() and not any(target.iterdir()):
+        target.rmdir()
+    if not target.exists():
+        target.symlink_to(ROOT / "hardware", target_is_directory=True)
+
+
+def rendered_outputs(worktree: Path) -> list[Path]:
+    build = worktree / "build"
+    return sorted(
+        path
+        for path in build.rglob("*")
+        if path.suffix in RENDERED_SUFFIXES and (build / "mega") not in path.parents
+    )
+
+
+def clear_rendered_outputs(worktree: Path) -> None:
+    for path in rendered_outputs(worktree):
+        path.unlink()
+    shutil.rmtree(worktree / "build" / "mega", ignore_errors=True)
+
+
+def measure_commit(commit: Commit, scope: str, jobs: int, runs: int) -> dict:
+    """Build `commit` in a temporary worktree and return its timing and output size."""
+    scratch = Path(tempfile.mkdtemp(prefix=f"perf_{commit.short}_"))
+    worktree = scratch / "tree"
+    benchmark_build.run(["git", "worktree", "add", "--detach", str(worktree), commit.sha])
+    result: dict = {"commit": commit.sha, "subject": commit.subject, "scope": scope, "jobs": jobs}
+    try:
+        link_hardware(worktree)
+        benchmark_build.prebuild_shared_prereqs(scope, jobs, worktree)
+        target = benchmark_build.make_target_for_scope(scope)
+        samples = []
+        for _ in range(runs):
+            clear_rendered_outputs(worktree)
+            samples.append(benchmark_build.timed(["make", "-j", str(jobs), target], worktree))
+        outputs = rendered_outputs(worktree)
+        result.update(
+            seconds=round(min(samples), 3),
+            outputs=len(outputs),
+            output_bytes=sum(path.stat().st_size for path in outputs),
+        )
+    except subprocess.CalledProcessError as error:
+        # Like `git bisect skip`: the revision cannot be measured.
+        result["error"] = f"{error.cmd[0]} exited with {error.returncode}"
+    finally:
+        subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=ROOT, check=False)
+        shutil.rmtree(scratch, ignore_errors=True)
+    result["measured_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    return result
+
+
+class Bisector:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.history = load_history(args.history)
+        self.baseline: dict | None = None
+
+    def measure(self, commit: Commit) -> dict:
+        key = history_key(commit, self.args.scope, self.args.jobs)
+        cached = self.history.get(key)
+        if cached is None or self.args.refresh:
+            cached = measure_commit(commit, self.args.scope, self.args.jobs, self.args.runs)
+            self.history[key] = cached
+            save_history(self.args.history, self.history)
+        state = "skip" if "error" in cached else ("bad" if self.regressed(cached) else "good")
+        details = cached.get("error") or (
+            f"seconds={cached['seconds']:.3f} outputs={cached['outputs']} output_bytes={cached['output_bytes']}"
+        )
+        print(f"commit={commit.short} state={state} {details} subject={commit.subject!r}", flush=True)
+        return cached
+
+    def regressed(self, result: dict) -> bool:
+        if self.baseline is None or result is self.baseline:
+            return False
+        return (
+            result["seconds"] > self.baseline["seconds"] * self.args.max_slowdown
+            or result["output_bytes"] > self.baseline["output_bytes"] * self.args.max_size_growth
+        )
+
+    def is_bad(self, commit: Commit) -> bool | None:
+        """Return whether `commit` regressed, or None if it cannot be built."""
+        result = self.measure(commit)
+        return None if "error" in result else self.regressed(result)
+
+    def first_bad(self, commits: list[Commit]) -> tuple[int, list[int]]:
+        """Binary-search for the first regressed commit.
+
+        commits[0] must be known good and commits[-1] known bad. Returns the
+        first bad index and the skipped indices before it.
+        """
+        good, bad = 0, len(commits) - 1
+        skipped: set[int] = set()
+        while True:
+            candidates = [index for index in range(good + 1, bad) if index not in skipped]
+            if not candidates:
+                return bad, sorted(index for index in skipped if good < index < bad)
+            middle = candidates[len(candidates) // 2]
+            verdict = self.is_bad(commits[middle])
+            if verdict is None:
+                skipped.add(middle)
+            elif verdict:
+                bad = middle
+            else:
+                good = middle
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Find the commit that made the template build slower or its outputs larger."
+    )
+    parser.add_argument("good", help="Revision with acceptable build performance.")
+    parser.add_argument("bad", nargs="?", default="HEAD", help="Revision to check (default: HEAD).")
+    parser.add_argument("--scope", choices=("universal", "all"), default="universal")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--runs", type=int, default=1, help="Builds per revision; the fastest counts.")
+    parser.add_argument("--max-slowdown", type=float, default=MAX_SLOWDOWN)
+    parser.add_argument("--max-size-growth", type=float, default=MAX_SIZE_GROWTH)
+    parser.add_argument("--history", type=Path, default=HISTORY_PATH)
+    parser.add_argument("--refresh", action="store_true", help="Re-measure revisions already in the history.")
+    parser.add_argument(
+        "--all",
+        action="store_true",
+        help="Measure every revision in the range instead of bisecting.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.runs < 1:
+        print("--runs must be at least 1", file=sys.stderr)
+        return 2
+    commits = commit_range(args.good, args.bad)
+    print(f"range={commits[0].short}..{commits[-1].short} commits={len(commits) - 1}")
+
+    bisector = Bisector(args)
+    baseline = bisector.measure(commits[0])
+    if "error" in baseline:
+        print(f"cannot build the good revision {commits[0].short}", file=sys.stderr)
+        return 2
+    bisector.baseline = baseline
+    if len(commits) == 1:
+        return 0
+
+    if args.all:
+        for commit in commits[1:]:
+            bisector.measure(commit)
+        print(f"history={args.history}")
+        return 0
+
+    verdict = bisector.is_bad(commits[-1])
+    if verdict is None:
+        print(f"cannot build the revision to check {commits[-1].short}", file=sys.stderr)
+        return 2
+    if not verdict:
+        print(f"history={args.history}")
+        print("no regression found")
+        return 0
+    index, skipped = bisector.first_bad(commits)
+    print(f"history={args.history}")
+    result = bisector.history[history_key(commits[index], args.scope, args.jobs)]
+    print(
+        f"first_bad={commits[index].sha} seconds={result['seconds']:.3f} "
+        f"baseline_seconds={baseline['seconds']:.3f} output_bytes={result['output_bytes']} "
+        f"baseline_output_bytes={baseline['output_bytes']} subject={commits[index].subject!r}"
+    )
+    if skipped:
+        print("skipped=" + ",".join(commits[i].short for i in skipped) + " (could not be built; any may be first)")
+    return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,17 +2,28 @@
 from __future__ import annotations
 
 import argparse
+import hashlib
+import io
+import itertools
+import json
+import os
 import subprocess
 import sys
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
 from pathlib import Path
 
-from pypdf import PdfReader, PdfWriter
-
 
 ROOT = Path(__file__).resolve().parents[1]
 BUILD_DIR = ROOT / "build"
 MEGA_DIR = BUILD_DIR / "mega"
+RASTER_INDEX = MEGA_DIR / "raster_index.json"
+# Compiled once from template.typ's `instructions-qr`; see write_page_furniture().
+QR_CODE_SVG = MEGA_DIR / "instructions_qr.svg"
+# Content hashes of every split page output; see update_manifest().
+MANIFEST = BUILD_DIR / "manifest.json"
+# Written by tools/solve_vehicle_clearance.py; only read with --solved-offsets.
+VEHICLE_CLEARANCE_TABLE = BUILD_DIR / "vehicle_clearance.json"
 UNIVERSAL_OFFSETS_MM = (
     (45, 75),
     (50, 80),
@@ -33,6 +44,23 @@ UNIVERSAL_MOUNTS = (
     ("konik_batman", "Konik Batman", True),
     ("konik_quickmount", "Konik Quick Mount", True),
 )
+UNIVERSAL_MIN_RADIUS_MM = 500
+UNIVERSAL_TOP_PADDING_MM = 20
+# Mirrors `all-radii` and the page setup in template.typ: landscape pages
+# with a 1cm margin, so the clearance block spans the paper width minus 2cm.
+CLEARANCE_RADII_MM = (300, 400, 500, 600, 700, 800, 900, 1000)
+PAPER_WIDTHS_MM = {"letter": 279.4, "a4": 297.0}
+PAPER_HEIGHTS_MM = {"letter": 215.9, "a4": 210.0}
+PAGE_MARGIN_MM = 10.0
+# Typst's `red` and a 1pt "dashed" stroke (3pt on, 3pt off), in millimetres.
+CLEARANCE_ARC_COLOR = "#ff4136"
+CLEARANCE_ARC_STROKE_MM = 25.4 / 72
+CLEARANCE_ARC_DASH_MM = 3 * 25.4 / 72
+# Chord error allowed when flattening arcs; far below a printer dot.
+CLEARANCE_ARC_SAGITTA_MM = 0.005
+# The page background tiling in template.typ: 5mm cells with a 0.1pt stroke.
+PAGE_GRID_MM = 5.0
+PAGE_GRID_STROKE_MM = 0.1 * 25.4 / 72
 VEHICLE_MOUNTS = (
     ("c3", "comma three", 35),
     ("c3x", "comma 3x", 35),
@@ -40,13 +68,45 @@ VEHICLE_MOUNTS = (
 )
 VEHICLE_VARIANT_OFFSETS_MM = (45, 50, 55, 60, 65)
 VEHICLE_VARIANT_DIRS = ("2020_corolla", "2020_hyundai_santa_fe")
+GROUPS = ("universal-letter", "universal-a4", "vehicle-letter", "vehicle-a4")
+# Document stem for --unified builds, which put every selected group in one document.
+UNIFIED_STEM = "unified"
+GROUP_DEPS = (
+    ROOT / "template.typ",
+    ROOT / "tools" / "build_mega_templates.py",
+    ROOT / "fonts" / "DejaVuSansMono.ttf",
+    ROOT / "img" / "car_with_centerline.svg",
+)
+
+
+@dataclass(frozen=True)
+class RasterOptions:
+    ppi: int = 144
+    compress_level: int = 9
+    palette_colors: int = 0
+    use_cache: bool = True
+    # Threads per Typst compile (typst --jobs); None leaves it to Typst. It
+    # does not change the output, so it is not part of key().
+    typst_jobs: int | None = None
+
+    def key(self) -> str:
+        return f"ppi={self.ppi} zlib={self.compress_level} palette={self.palette_colors}"
 
 
 @dataclass(frozen=True)
 class Render:
     pdf: Path
     png: Path
-    body: str
+    args: dict[str, str]
+    deps: tuple[Path, ...] = ()
+
+    @property
+    def body(self) -> str:
+        return template_call(self.args)
+
+    @property
+    def bw_png(self) -> Path:
+        return self.png.with_name(f"{self.png.stem}_bw.png")
 
 
 def run_git(args: list[str], default: str = "") -> str:
@@ -83,40 +143,192 @@ def common_git_args() -> dict[str, str]:
     }
 
 
-def universal_renders(paper: str) -> list[Render]:
-    renders: list[Render] = []
+def mount_size_args(mount: str) -> dict[str, str]:
+    """Return the footprint size from normalize_svg.py's sidecar, if built yet.
+
+    Planning runs before the SVGs exist; the template measures the image
+    itself when these arguments are absent.
+    """
+    sidecar = BUILD_DIR / f"{mount}_mount.json"
+    if not sidecar.exists():
+        return {}
+    size = json.loads(sidecar.read_text())
+    return {
+        "svg-width": f"{round(size['width_mm'], 4)}mm",
+        "svg-height": f"{round(size['height_mm'], 4)}mm",
+    }
+
+
+def clearance_arcs_path(paper: str) -> Path:
+    return MEGA_DIR / (
+        f"clearance_arcs_{paper}_r{UNIVERSAL_MIN_RADIUS_MM}_t{UNIVERSAL_TOP_PADDING_MM}.svg"
+    )
+
+
+def clearance_arcs_svg(paper: str, min_radius_mm: float, top_padding_mm: float) -> str:
+    """Return the visible part of the universal clearance arcs as an SVG.
+
+    template.typ places circles tangent to the reference line and clips them
+    to the layout block; only the strip above the line is ever visible, so
+    the arcs are clipped to that strip once here instead of on every page.
+    """
+    import math
+
+    from shapely.geometry import LineString, box
+
+    width = PAPER_WIDTHS_MM[paper] - 2 * PAGE_MARGIN_MM
+    # The block clips at its own edges, not at the line, so the stroke below
+    # each tangent point stays visible.
+    height = top_padding_mm + CLEARANCE_ARC_STROKE_MM
+    visible = box(-width / 2, 0, width / 2, height)
+    paths = []
+    for radius in (r for r in CLEARANCE_RADII_MM if r >= min_radius_mm):
+        center_y = top_padding_mm - radius
+        # Only the bottom of the circle can reach the strip; sample that span.
+        half_angle = min(math.asin(min(width / 2 / radius, 1.0)) * 1.05, math.pi / 2)
+        step = 2 * math.acos(1 - CLEARANCE_ARC_SAGITTA_MM / radius)
+        count = max(2, math.ceil(2 * half_angle / step) + 1)
+        points = [
+            (radius * math.sin(angle), center_y + radius * math.cos(angle))
+            for angle in (-half_angle + 2 * half_angle * i / (count - 1) for i in range(count))
+        ]
+        clipped = LineString(points).intersection(visible)
+        for line in getattr(clipped, "geoms", [clipped]):
+            if line.is_empty or line.geom_type != "LineString":
+                continue
+            coords = " ".join(f"{x:.3f},{y:.3f}" for x, y in line.coords)
+            paths.append(f'<path d="M {coords}"/>')
+
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" version="1.1" '
+        f'width="{width}mm" height="{height:.4f}mm" '
+        f'viewBox="{-width / 2} 0 {width} {height:.4f}">\n'
+        f'<g fill="none" stroke="{CLEARANCE_ARC_COLOR}" '
+        f'stroke-width="{CLEARANCE_ARC_STROKE_MM:.4f}" '
+        f'stroke-dasharray="{CLEARANCE_ARC_DASH_MM:.4f} {CLEARANCE_ARC_DASH_MM:.4f}">\n'
+        + "\n".join(paths)
+        + "\n</g>\n</svg>\n"
+    )
+
+
+def write_clearance_arcs(paper: str) -> Path:
+    path = clearance_arcs_path(paper)
+    write_if_changed(
+        path, clearance_arcs_svg(paper, UNIVERSAL_MIN_RADIUS_MM, UNIVERSAL_TOP_PADDING_MM)
+    )
+    return path
+
+
+def page_grid_path(paper: str) -> Path:
+    return MEGA_DIR / f"page_grid_{paper}.svg"
+
+
+def page_grid_svg(paper: str) -> str:
+    """Return the page background grid for a landscape page as one SVG path.
+
+    Typst would otherwise lay out the tiling for every page; as an image it
+    is parsed once per document and shared by all pages of that paper size.
+    """
+    width, height = PAPER_WIDTHS_MM[paper], PAPER_HEIGHTS_MM[paper]
+    columns = int(width // PAGE_GRID_MM)
+    rows = int(height // PAGE_GRID_MM)
+    lines = [f"M {i * PAGE_GRID_MM:g},0 V {height:g}" for i in range(columns + 1)]
+    lines += [f"M 0,{i * PAGE_GRID_MM:g} H {width:g}" for i in range(rows + 1)]
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" version="1.1" '
+        f'width="{width:g}mm" height="{height:g}mm" viewBox="0 0 {width:g} {height:g}">\n'
+        f'<path fill="none" stroke="black" stroke-width="{PAGE_GRID_STROKE_MM:.4f}" d="'
+        + " ".join(lines)
+        + '"/>\n</svg>\n'
+    )
+
+
+def write_page_furniture(papers: Iterable[str], typst: str) -> None:
+    """Write the page grid for each paper and the instructions QR code.
+
+    Pages reference these through `page-grid-svg` and `qr-code-svg`. The QR
+    code comes from template.typ's own `instructions-qr`, so it is only
+    recompiled when template.typ changes.
+    """
+    for paper in papers:
+        write_if_changed(page_grid_path(paper), page_grid_svg(paper))
+
+    template = ROOT / "template.typ"
+    if QR_CODE_SVG.exists() and QR_CODE_SVG.stat().st_mtime >= template.stat().st_mtime:
+        return
+    source = MEGA_DIR / "instructions_qr.typ"
+    write_if_changed(
+        source,
+        '#import "/template.typ": instructions-qr\n'
+        "#set page(width: auto, height: auto, margin: 0pt)\n"
+        "#instructions-qr\n",
+    )
+    # Per-process name: parallel group builds may both find the QR code stale.
+    compiled = MEGA_DIR / f"instructions_qr.{os.getpid()}.svg"
+    run([typst, "compile", str(source), str(compiled), "--root", ".", "--font-path", "fonts"])
+    if not replace_if_changed(QR_CODE_SVG, compiled.read_bytes()):
+        QR_CODE_SVG.touch()
+    compiled.unlink()
+
+
+def furniture_args(paper: str) -> dict[str, str]:
+    return {
+        "page-grid-svg": typst_str(relative(page_grid_path(paper))),
+        "qr-code-svg": typst_str(relative(QR_CODE_SVG)),
+    }
+
+
+def universal_render(
+    paper: str,
+    mount: str,
+    label: str,
+    is_konik: bool,
+    primary: float,
+    secondary: float,
+    git_args: dict[str, str],
+) -> Render:
+    """Return the render for one universal mount and paired offset.
+
+    Offsets are not limited to ``UNIVERSAL_OFFSETS_MM``; tools/template_server.py
+    uses this for pairs outside the published grid.
+    """
     suffix = "a4" if paper == "a4" else "letter"
-    git_args = common_git_args()
+    primary_label = f"{primary:g}"
+    secondary_label = f"{secondary:g}"
+    stem = f"{mount}_mount_{primary_label}_{secondary_label}mm"
+    args = {
+        "mount-name": typst_str(
+            f"{label} (paired {primary_label}mm/{secondary_label}mm)"
+        ),
+        "footprint-label": typst_str(label),
+        "svg-file": typst_str(f"build/{mount}_mount.svg"),
+        **mount_size_args(mount),
+        "clearance-offset": f"{primary_label}mm",
+        "secondary-clearance-offset": f"{secondary_label}mm",
+        **git_args,
+        "min-radius": f"{UNIVERSAL_MIN_RADIUS_MM}mm",
+        "top-padding": f"{UNIVERSAL_TOP_PADDING_MM}mm",
+        "clearance-arcs-svg": typst_str(relative(clearance_arcs_path(paper))),
+        **furniture_args(paper),
+    }
+    if paper == "a4":
+        args["paper-size"] = typst_str("a4")
+    if is_konik:
+        args["feedback-community-url"] = typst_str("https://discord.gg/HCb2DbEKJD")
+        args["feedback-community-label"] = typst_str("Konik Discord")
+        args["feedback-community-channel"] = typst_str("")
+    return Render(
+        pdf=BUILD_DIR / f"{stem}_{suffix}.pdf",
+        png=BUILD_DIR / f"{stem}_{suffix}.png",
+        args=args,
+        deps=(BUILD_DIR / f"{mount}_mount.svg",),
+    )
 
+
+def universal_renders(paper: str, git_args: dict[str, str]) -> Iterator[Render]:
     for mount, label, is_konik in UNIVERSAL_MOUNTS:
         for primary, secondary in UNIVERSAL_OFFSETS_MM:
-            stem = f"{mount}_mount_{primary}_{secondary}mm"
-            args = {
-                "mount-name": typst_str(
-                    f"{label} (paired {primary}mm/{secondary}mm)"
-                ),
-                "footprint-label": typst_str(label),
-                "svg-file": typst_str(f"build/{mount}_mount.svg"),
-                "clearance-offset": f"{primary}mm",
-                "secondary-clearance-offset": f"{secondary}mm",
-                **git_args,
-                "min-radius": "500mm",
-                "top-padding": "2cm",
-            }
-            if paper == "a4":
-                args["paper-size"] = typst_str("a4")
-            if is_konik:
-                args["feedback-community-url"] = typst_str("https://discord.gg/HCb2DbEKJD")
-                args["feedback-community-label"] = typst_str("Konik Discord")
-                args["feedback-community-channel"] = typst_str("")
-            renders.append(
-                Render(
-                    pdf=BUILD_DIR / f"{stem}_{suffix}.pdf",
-                    png=BUILD_DIR / f"{stem}_{suffix}.png",
-                    body=template_call(args),
-                )
-            )
-    return renders
+            yield universal_render(paper, mount, label, is_konik, primary, secondary, git_args)
 
 
 def vehicle_dirs() -> list[str]:
@@ -128,33 +340,60 @@ def vehicle_name(vehicle: str) -> str:
     return (ROOT / "vehicles" / vehicle / "name.txt").read_text().strip()
 
 
-def vehicle_renders(paper: str) -> list[Render]:
-    renders: list[Render] = []
+def vehicle_deps(vehicle: str, mount: str) -> tuple[Path, ...]:
+    vehicle_dir = ROOT / "vehicles" / vehicle
+    return (
+        BUILD_DIR / f"{mount}_mount.svg",
+        vehicle_dir / "template.typ",
+        vehicle_dir / "name.txt",
+        vehicle_dir / "gen" / "offsets.svg",
+    )
+
+
+def solved_vehicle_offsets() -> dict[str, dict[str, int]]:
+    if not VEHICLE_CLEARANCE_TABLE.exists():
+        raise FileNotFoundError(
+            f"{VEHICLE_CLEARANCE_TABLE} is missing; run tools/solve_vehicle_clearance.py first"
+        )
+    table = json.loads(VEHICLE_CLEARANCE_TABLE.read_text())["vehicles"]
+    return {
+        vehicle: {mount: result["offset_mm"] for mount, result in row.items()}
+        for vehicle, row in table.items()
+    }
+
+
+def vehicle_renders(
+    paper: str,
+    git_args: dict[str, str],
+    solved_offsets: bool = False,
+) -> Iterator[Render]:
     suffix = "a4" if paper == "a4" else "letter"
-    git_args = common_git_args()
+    solved = solved_vehicle_offsets() if solved_offsets else {}
 
     for vehicle in vehicle_dirs():
         name = vehicle_name(vehicle)
-        for mount, label, offset in VEHICLE_MOUNTS:
+        for mount, label, default_offset in VEHICLE_MOUNTS:
+            offset = solved.get(vehicle, {}).get(mount, default_offset)
             stem = f"{mount}_mount"
             args = {
                 "mount-name": typst_str(f"{label} ({name})"),
                 "footprint-label": typst_str(label),
                 "svg-file": typst_str(f"build/{mount}_mount.svg"),
+                **mount_size_args(mount),
                 "clearance-offset": f"{offset}mm",
                 "custom-clearance-svg": typst_str(f"/vehicles/{vehicle}/gen/offsets.svg"),
                 **git_args,
                 "min-radius": "500mm",
                 "top-padding": "2cm",
+                **furniture_args(paper),
             }
             if paper == "a4":
                 args["paper-size"] = typst_str("a4")
-            renders.append(
-                Render(
-                    pdf=BUILD_DIR / "vehicles" / vehicle / f"{stem}_{suffix}.pdf",
-                    png=BUILD_DIR / "vehicles" / vehicle / f"{stem}_{suffix}.png",
-                    body=template_call(args),
-                )
+            yield Render(
+                pdf=BUILD_DIR / "vehicles" / vehicle / f"{stem}_{suffix}.pdf",
+                png=BUILD_DIR / "vehicles" / vehicle / f"{stem}_{suffix}.png",
+                args=args,
+                deps=vehicle_deps(vehicle, mount),
             )
 
     for vehicle in VEHICLE_VARIANT_DIRS:
@@ -166,6 +405,7 @@ def vehicle_renders(paper: str) -> list[Render]:
                     "mount-name": typst_str(f"{label} ({name})"),
                     "footprint-label": typst_str(label),
                     "svg-file": typst_str(f"build/{mount}_mount.svg"),
+                    **mount_size_args(mount),
                     "clearance-offset": f"{offset}mm",
                     "custom-clearance-svg": typst_str(
                         f"/vehicles/{vehicle}/gen/offsets.svg"
@@ -173,38 +413,61 @@ def vehicle_renders(paper: str) -> list[Render]:
                     **git_args,
                     "min-radius": "500mm",
                     "top-padding": "2cm",
+                    **furniture_args(paper),
                 }
                 if paper == "a4":
                     args["paper-size"] = typst_str("a4")
-                renders.append(
-                    Render(
-                        pdf=BUILD_DIR / "vehicles" / vehicle / f"{stem}_{suffix}.pdf",
-                        png=BUILD_DIR / "vehicles" / vehicle / f"{stem}_{suffix}.png",
-                        body=template_call(args),
-                    )
+                yield Render(
+                    pdf=BUILD_DIR / "vehicles" / vehicle / f"{stem}_{suffix}.pdf",
+                    png=BUILD_DIR / "vehicles" / vehicle / f"{stem}_{suffix}.png",
+                    args=args,
+                    deps=vehicle_deps(vehicle, mount),
                 )
-    return renders
 
 
-def group_renders(group: str) -> list[Render]:
-    if group == "universal-letter":
-        return universal_renders("letter")
-    if group == "universal-a4":
-        return universal_renders("a4")
-    if group == "vehicle-letter":
-        return vehicle_renders("letter")
-    if group == "vehicle-a4":
-        return vehicle_renders("a4")
-    raise ValueError(f"unknown group: {group}")
+def iter_group_renders(
+    group: str,
+    git_args: dict[str, str] | None = None,
+    solved_offsets: bool = False,
+) -> Iterator[Render]:
+    """Yield the renders for a group.
+
+    Pass ``git_args={}`` when only paths or dependencies are needed; this
+    skips the git subprocesses that the page footers require. With
+    ``solved_offsets`` the default vehicle pages use the offsets from
+    ``VEHICLE_CLEARANCE_TABLE`` instead of ``VEHICLE_MOUNTS``.
+    """
+    if group not in GROUPS:
+        raise ValueError(f"unknown group: {group}")
+    if git_args is None:
+        git_args = common_git_args()
+    kind, paper = group.split("-")
+    if kind == "universal":
+        return universal_renders(paper, git_args)
+    return vehicle_renders(paper, git_args, solved_offsets)
+
+
+def group_renders(
+    group: str,
+    git_args: dict[str, str] | None = None,
+    solved_offsets: bool = False,
+) -> list[Render]:
+    return list(iter_group_renders(group, git_args, solved_offsets))
+
+
+def render_windows(renders: Iterable[Render], size: int) -> Iterator[list[Render]]:
+    iterator = iter(renders)
+    while window := list(itertools.islice(iterator, size)):
+        yield window
 
 
 def group_stem(group: str) -> str:
     return group.replace("-", "_")
 
 
-def write_typst(group: str, renders: list[Render]) -> Path:
+def write_typst(stem: str, renders: list[Render]) -> Path:
     MEGA_DIR.mkdir(parents=True, exist_ok=True)
-    typ_path = MEGA_DIR / f"{group_stem(group)}.typ"
+    typ_path = MEGA_DIR / f"{stem}.typ"
     parts = ['#import "/template.typ": template', ""]
     for index, render in enumerate(renders):
         parts.append(render.body)
@@ -220,51 +483,214 @@ def run(cmd: list[str]) -> None:
     subprocess.run(cmd, cwd=ROOT, check=True)
 
 
-def split_pdf(mega_pdf: Path, renders: list[Render]) -> None:
+def replace_if_changed(path: Path, data: bytes) -> bool:
+    """Atomically replace `path` with `data` unless it already holds those bytes.
+
+    Unchanged files keep their mtime, so make and the Pages upload only see
+    outputs whose content actually changed.
+    """
+    if path.exists() and path.stat().st_size == len(data) and path.read_bytes() == data:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return True
+
+
+def update_manifest(outputs: list[Path], changed: set[Path]) -> None:
+    """Record content hashes for `outputs` in MANIFEST.
+
+    Each update bumps the manifest's ``build`` counter, and a file's entry
+    takes the new counter only when its hash changed, so downstream steps
+    can select files changed since the last build they processed. Groups
+    built concurrently by ``make -j`` serialise on a lock file.
+    """
+    import fcntl
+
+    MANIFEST.parent.mkdir(parents=True, exist_ok=True)
+    with open(MANIFEST.with_suffix(".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        manifest = json.loads(MANIFEST.read_text()) if MANIFEST.exists() else {}
+        build = manifest.get("build", 0) + 1
+        files = manifest.get("files", {})
+        for path in outputs:
+            key = relative(path)
+            entry = files.get(key)
+            if entry is not None and path not in changed:
+                continue
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            if entry is None or entry["sha256"] != digest:
+                files[key] = {"sha256": digest, "build": build}
+        replace_if_changed(
+            MANIFEST,
+            (json.dumps({"build": build, "files": files}, indent=2, sort_keys=True) + "\n").encode(),
+        )
+
+
+def split_pdf(mega_pdf: Path, renders: list[Render], changed: set[Path]) -> list[str]:
+    """Write one PDF per render and return the SHA-256 of each page file.
+
+    Pages whose bytes differ from the existing file are added to `changed`.
+    """
+    # Imported here so planning (--list-outputs, --plan-*) stays cheap.
+    from pypdf import PdfReader, PdfWriter
+
     reader = PdfReader(mega_pdf)
     if len(reader.pages) != len(renders):
         raise RuntimeError(
             f"{mega_pdf} has {len(reader.pages)} pages, expected {len(renders)}"
         )
+    digests = []
     for page, render in zip(reader.pages, renders, strict=True):
-        render.pdf.parent.mkdir(parents=True, exist_ok=True)
         writer = PdfWriter()
         writer.add_page(page)
-        with render.pdf.open("wb") as file:
-            writer.write(file)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        data = buffer.getvalue()
+        if replace_if_changed(render.pdf, data):
+            changed.add(render.pdf)
+        digests.append(hashlib.sha256(data).hexdigest())
+    return digests
+
+
+def read_raster_index(options: RasterOptions) -> dict[str, str]:
+    if not RASTER_INDEX.exists():
+        return {}
+    index = json.loads(RASTER_INDEX.read_text())
+    if index.get("settings") != options.key():
+        return {}
+    return index.get("pages", {})
+
+
+def load_raster_index(options: RasterOptions) -> dict[str, str]:
+    if not options.use_cache:
+        return {}
+    return read_raster_index(options)
+
+
+def save_raster_index(options: RasterOptions, pages: dict[str, str]) -> None:
+    """Merge `pages` into RASTER_INDEX.
+
+    Groups built concurrently by ``make -j`` share the index, so updates
+    serialise on a lock file and re-read it before merging, like
+    update_manifest.
+    """
+    import fcntl
+
+    RASTER_INDEX.parent.mkdir(parents=True, exist_ok=True)
+    with open(RASTER_INDEX.with_suffix(".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index = read_raster_index(options)
+        index.update(pages)
+        replace_if_changed(
+            RASTER_INDEX,
+            (json.dumps({"settings": options.key(), "pages": index}, indent=2, sort_keys=True) + "\n").encode(),
+        )
 
 
-def move_png_pages(group: str, renders: list[Render]) -> None:
-    for index, render in enumerate(renders, start=1):
-        page_png = MEGA_DIR / f"{group_stem(group)}_page-{index}.png"
+def stale_pages(renders: list[Render], digests: list[str], index: dict[str, str]) -> list[int]:
+    """Return 1-based page numbers whose PDF bytes or PNG outputs changed."""
+    stale = []
+    for number, (render, digest) in enumerate(zip(renders, digests, strict=True), start=1):
+        key = str(render.png.relative_to(ROOT))
+        if index.get(key) != digest or not render.png.exists() or not render.bw_png.exists():
+            stale.append(number)
+    return stale
+
+
+def encode_png(image, options: RasterOptions) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=options.compress_level)
+    return buffer.getvalue()
+
+
+def write_png_variants(page_png: Path, render: Render, options: RasterOptions, changed: set[Path]) -> None:
+    """Write the color and greyscale PNGs for a page from one decode."""
+    from PIL import Image
+
+    with Image.open(page_png) as image:
+        image.load()
+        color = image.convert("RGB")
+    grey = color.convert("L")
+    if options.palette_colors:
+        # Templates are mostly black lines on white with a little red, so a
+        # small palette is visually lossless and much smaller than RGB.
+        color = color.quantize(colors=options.palette_colors)
+    if replace_if_changed(render.png, encode_png(color, options)):
+        changed.add(render.png)
+    if replace_if_changed(render.bw_png, encode_png(grey, options)):
+        changed.add(render.bw_png)
+    elif render.png in changed:
+        # Keep the greyscale derivative at least as new as its source so the
+        # Makefile's %_bw.png rule does not redo work done here.
+        os.utime(render.bw_png)
+    page_png.unlink()
+
+
+def move_png_pages(
+    stem: str,
+    renders: list[Render],
+    pages: list[int],
+    options: RasterOptions,
+    changed: set[Path],
+) -> None:
+    for index in pages:
+        render = renders[index - 1]
+        page_png = MEGA_DIR / f"{stem}_page-{index}.png"
         if not page_png.exists():
             raise RuntimeError(f"missing Typst PNG page: {page_png}")
-        render.png.parent.mkdir(parents=True, exist_ok=True)
-        page_png.replace(render.png)
+        write_png_variants(page_png, render, options, changed)
 
 
-def touch_outputs(stamp: Path | None, renders: list[Render]) -> None:
+def touch_stamp(stamp: Path | None) -> None:
+    """Mark a group as built.
+
+    Page outputs are deliberately left alone: the Makefile's per-output
+    rules only check that they exist, and an unchanged page keeps its mtime.
+    """
     if stamp is not None:
         stamp.parent.mkdir(parents=True, exist_ok=True)
         stamp.touch()
-    for render in renders:
-        render.pdf.touch()
-        render.png.touch()
 
 
-def build_group(group: str, typst: str, ppi: int, stamp: Path | None) -> None:
-    renders = group_renders(group)
-    typ_path = write_typst(group, renders)
-    mega_pdf = MEGA_DIR / f"{group_stem(group)}.pdf"
-    png_pattern = MEGA_DIR / f"{group_stem(group)}_page-{{p}}.png"
+def report_timings(stem: str, typ_path: Path, renders: list[Render], trace: Path) -> None:
+    import typst_timings
+
+    report = typst_timings.attribute(trace, typ_path, renders)
+    write_if_changed(MEGA_DIR / f"{stem}.timings_report.json", json.dumps(report, indent=2) + "\n")
+    typst_timings.print_report(report)
+
+
+def compile_pages(
+    stem: str,
+    renders: list[Render],
+    typst: str,
+    options: RasterOptions,
+    timings: bool = False,
+) -> None:
+    typ_path = write_typst(stem, renders)
+    mega_pdf = MEGA_DIR / f"{stem}.pdf"
+    png_pattern = MEGA_DIR / f"{stem}_page-{{p}}.png"
+    trace = MEGA_DIR / f"{stem}.timings.json"
 
-    for stale_png in MEGA_DIR.glob(f"{group_stem(group)}_page-*.png"):
+    for stale_png in MEGA_DIR.glob(f"{stem}_page-*.png"):
         stale_png.unlink()
 
-    run([typst, "compile", str(typ_path), str(mega_pdf), "--root", ".", "--font-path", "fonts"])
-    split_pdf(mega_pdf, renders)
-    run(
-        [
+    jobs = ["--jobs", str(options.typst_jobs)] if options.typst_jobs is not None else []
+    cmd = [typst, "compile", str(typ_path), str(mega_pdf), "--root", ".", "--font-path", "fonts", *jobs]
+    if timings:
+        cmd.extend(["--timings", str(trace)])
+    run(cmd)
+    if timings:
+        report_timings(stem, typ_path, renders, trace)
+    changed: set[Path] = set()
+    digests = split_pdf(mega_pdf, renders, changed)
+
+    index = load_raster_index(options)
+    pages = stale_pages(renders, digests, index)
+    if pages:
+        cmd = [
             typst,
             "compile",
             str(typ_path),
@@ -274,40 +700,225 @@ def build_group(group: str, typst: str, ppi: int, stamp: Path | None) -> None:
             "--font-path",
             "fonts",
             "--ppi",
-            str(ppi),
+            str(options.ppi),
+            *jobs,
         ]
+        if len(pages) != len(renders):
+            cmd.extend(["--pages", ",".join(str(page) for page in pages)])
+        run(cmd)
+        move_png_pages(stem, renders, pages, options, changed)
+    save_raster_index(
+        options,
+        {str(render.png.relative_to(ROOT)): digest for render, digest in zip(renders, digests, strict=True)},
+    )
+    outputs = [path for render in renders for path in (render.pdf, render.png, render.bw_png)]
+    update_manifest(outputs, changed)
+    print(
+        f"rasterized={len(pages)} cached={len(renders) - len(pages)} "
+        f"changed={len(changed)} unchanged={len(outputs) - len(changed)}"
+    )
+
+
+def compile_renders(
+    stem: str,
+    renders: Iterable[Render],
+    typst: str,
+    options: RasterOptions,
+    stamp: Path | None,
+    label: str,
+    max_pages: int | None = None,
+    timings: bool = False,
+) -> None:
+    """Compile `renders` as one document, or in windows of `max_pages`."""
+    # Parts from an earlier windowed build, possibly with more windows than
+    # this one, would otherwise stay in MEGA_DIR indefinitely.
+    for stale_part in MEGA_DIR.glob(f"{stem}_part*"):
+        stale_part.unlink()
+
+    if max_pages is None:
+        renders = list(renders)
+        compile_pages(stem, renders, typst, options, timings)
+        touch_stamp(stamp)
+        print(f"{label} pages={len(renders)}")
+        return
+
+    # Streaming mode: only one window of renders, one Typst document and one
+    # mega PDF are alive at a time, so peak memory does not grow with the
+    # number of vehicles or offsets in the group.
+    pages = 0
+    windows = 0
+    for windows, window in enumerate(render_windows(renders, max_pages), start=1):
+        part = f"{stem}_part{windows}"
+        compile_pages(part, window, typst, options, timings)
+        # The window's pages are split out, so its mega PDF is no longer needed.
+        (MEGA_DIR / f"{part}.pdf").unlink(missing_ok=True)
+        pages += len(window)
+    touch_stamp(stamp)
+    print(f"{label} pages={pages} windows={windows}")
+
+
+def build_group(
+    group: str,
+    typst: str,
+    options: RasterOptions,
+    stamp: Path | None,
+    max_pages: int | None = None,
+    timings: bool = False,
+    solved_offsets: bool = False,
+) -> None:
+    kind, paper = group.split("-")
+    if kind == "universal":
+        write_clearance_arcs(paper)
+    write_page_furniture([paper], typst)
+
+    renders = iter_group_renders(group, solved_offsets=solved_offsets)
+    compile_renders(
+        group_stem(group), renders, typst, options, stamp, f"built_group={group}", max_pages, timings
+    )
+
+
+def build_unified(
+    groups: list[str],
+    typst: str,
+    options: RasterOptions,
+    stamp: Path | None,
+    max_pages: int | None = None,
+    timings: bool = False,
+    solved_offsets: bool = False,
+) -> None:
+    """Build several groups from one Typst document and compile.
+
+    Each page sets its own paper size, so Letter and A4 pages can share a
+    document; fonts, the QR package and the mount SVGs are then loaded once
+    instead of once per group. Pages still split back to their group's
+    usual outputs.
+    """
+    for paper in sorted({group.split("-")[1] for group in groups if group.startswith("universal-")}):
+        write_clearance_arcs(paper)
+    write_page_furniture(sorted({group.split("-")[1] for group in groups}), typst)
+
+    git_args = common_git_args()
+    renders = itertools.chain.from_iterable(
+        iter_group_renders(group, git_args, solved_offsets) for group in groups
+    )
+    compile_renders(
+        UNIFIED_STEM, renders, typst, options, stamp, f"built_unified={','.join(groups)}", max_pages, timings
     )
-    move_png_pages(group, renders)
-    touch_outputs(stamp, renders)
-    print(f"built_group={group} pages={len(renders)}")
 
 
 def expected_outputs(groups: list[str]) -> list[Path]:
     outputs: list[Path] = []
     for group in groups:
-        for render in group_renders(group):
+        for render in iter_group_renders(group, git_args={}):
             outputs.extend((render.pdf, render.png))
     return outputs
 
 
+def relative(path: Path) -> str:
+    return str(path.relative_to(ROOT))
+
+
+def output_plan(groups: list[str]) -> dict:
+    """Describe outputs, stamps and input dependencies without building."""
+    plan: dict[str, dict] = {}
+    for group in groups:
+        outputs: list[str] = []
+        deps = {relative(dep) for dep in GROUP_DEPS}
+        for render in iter_group_renders(group, git_args={}):
+            outputs.extend((relative(render.pdf), relative(render.png)))
+            deps.update(relative(dep) for dep in render.deps)
+        plan[group] = {
+            "stamp": relative(MEGA_DIR / f"{group_stem(group)}.stamp"),
+            "outputs": outputs,
+            "deps": sorted(deps),
+        }
+    return {"groups": plan}
+
+
+def make_fragment(plan: dict) -> str:
+    lines = ["# Generated by tools/build_mega_templates.py --plan-make. Do not edit.", ""]
+    for group, entry in plan["groups"].items():
+        var = "PLAN_" + group_stem(group).upper()
+        lines.append(f"{var}_OUTPUTS := " + " ".join(entry["outputs"]))
+        lines.append(f"{var}_DEPS := " + " ".join(entry["deps"]))
+    return "\n".join(lines) + "\n"
+
+
+def write_if_changed(path: Path, text: str) -> None:
+    replace_if_changed(path, text.encode())
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Build grouped Typst template PDFs/PNGs.")
     parser.add_argument(
         "--group",
         dest="groups",
         action="append",
-        choices=("universal-letter", "universal-a4", "vehicle-letter", "vehicle-a4"),
+        choices=GROUPS,
         required=True,
         help="Mega render group to build. May be repeated.",
     )
     parser.add_argument("--typst", default="typst")
     parser.add_argument("--ppi", type=int, default=144)
+    parser.add_argument(
+        "--png-compress-level",
+        type=int,
+        choices=range(10),
+        default=9,
+        help="zlib compression level for written PNGs.",
+    )
+    parser.add_argument(
+        "--png-palette-colors",
+        type=int,
+        default=0,
+        help="Quantize color PNGs to this many palette colors (0 keeps RGB).",
+    )
+    parser.add_argument(
+        "--no-raster-cache",
+        action="store_true",
+        help="Re-rasterize every page even if its split PDF is unchanged.",
+    )
+    parser.add_argument(
+        "--typst-jobs",
+        type=int,
+        help="Threads for each Typst compile (typst --jobs). Defaults to Typst's choice.",
+    )
     parser.add_argument("--stamp", type=Path)
+    parser.add_argument(
+        "--max-pages-per-compile",
+        type=int,
+        help="Stream renders through Typst in windows of at most this many pages.",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Record Typst's compile timings and attribute them to pages, mounts and template features.",
+    )
+    parser.add_argument(
+        "--unified",
+        action="store_true",
+        help="Compile all selected groups as one Typst document instead of one per group.",
+    )
+    parser.add_argument(
+        "--solved-offsets",
+        action="store_true",
+        help="Use offsets from build/vehicle_clearance.json for the default vehicle pages.",
+    )
     parser.add_argument(
         "--list-outputs",
         action="store_true",
         help="Print expected output paths for the selected groups without building.",
     )
+    parser.add_argument(
+        "--plan-json",
+        type=Path,
+        help="Write the output plan (outputs, stamps, dependencies) as JSON and exit.",
+    )
+    parser.add_argument(
+        "--plan-make",
+        type=Path,
+        help="Write the output plan as a Makefile fragment and exit.",
+    )
     return parser.parse_args()
 
 
@@ -317,13 +928,55 @@ def main() -> int:
         for output in expected_outputs(args.groups):
             print(output.relative_to(ROOT))
         return 0
+    if args.plan_json is not None or args.plan_make is not None:
+        plan = output_plan(args.groups)
+        if args.plan_json is not None:
+            write_if_changed(args.plan_json, json.dumps(plan, indent=2) + "\n")
+        if args.plan_make is not None:
+            write_if_changed(args.plan_make, make_fragment(plan))
+        return 0
 
     stamp = args.stamp
-    if stamp is not None and len(args.groups) != 1:
-        print("--stamp can only be used with one --group", file=sys.stderr)
+    if stamp is not None and len(args.groups) != 1 and not args.unified:
+        print("--stamp can only be used with one --group (or with --unified)", file=sys.stderr)
         return 2
+    if not 0 <= args.png_palette_colors <= 256:
+        print("--png-palette-colors must be 0 (RGB) or between 1 and 256", file=sys.stderr)
+        return 2
+    if args.typst_jobs is not None and args.typst_jobs < 1:
+        print("--typst-jobs must be at least 1", file=sys.stderr)
+        return 2
+    if args.max_pages_per_compile is not None and args.max_pages_per_compile < 1:
+        print("--max-pages-per-compile must be at least 1", file=sys.stderr)
+        return 2
+    options = RasterOptions(
+        ppi=args.ppi,
+        compress_level=args.png_compress_level,
+        palette_colors=args.png_palette_colors,
+        use_cache=not args.no_raster_cache,
+        typst_jobs=args.typst_jobs,
+    )
+    if args.unified:
+        build_unified(
+            list(dict.fromkeys(args.groups)),
+            args.typst,
+            options,
+            stamp,
+            args.max_pages_per_compile,
+            args.timings,
+            args.solved_offsets,
+        )
+        return 0
     for group in args.groups:
-        build_group(group, args.typst, args.ppi, stamp)
+        build_group(
+            group,
+            args.typst,
+            options,
+            stamp,
+            args.max_pages_per_compile,
+            args.timings,
+            args.solved_offsets,
+        )
     return 0
 
 
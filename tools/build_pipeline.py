@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import asyncio
+import fnmatch
+import heapq
+import json
+import os
+import re
+import select
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import build_mega_templates
+
+
+ROOT = build_mega_templates.ROOT
+BUILD_DIR = build_mega_templates.BUILD_DIR
+TIMINGS_PATH = BUILD_DIR / "pipeline_timings.json"
+TOOLS_DIR = ROOT / "tools"
+
+# Canonical vendor STLs, as picked by `make index-vendor` for the Makefile.
+VENDOR_SOURCES = dict(
+    re.findall(r"^(\w+) := (\S+)$", (ROOT / "vendor" / "canonical.mk").read_text(), re.MULTILINE)
+)
+# Mirrors the mount rules in the Makefile: (mount, source STL, flip, projection).
+MOUNT_SOURCES = (
+    ("c3", "hardware/comma_three/mount/c3_mount.stl", False, "project_mount.scad"),
+    ("c3x", "hardware/comma_3X/mount/c3x_mount.stl", False, "project_mount.scad"),
+    ("c4", "hardware/comma_four/mount/four_mount.stl", True, "project_mount.scad"),
+    ("konik_batman", VENDOR_SOURCES["KONIK_BATMAN_SOURCE"], False, "project_mount.scad"),
+    ("konik_quickmount", VENDOR_SOURCES["KONIK_QUICKMOUNT_SOURCE"], False, "project_mount_hull.scad"),
+)
+# (output stem, mount, label, bridge type, bridge gap, solid)
+CUTTING_TEMPLATES = (
+    ("c3_cutting_template", "c3", "comma three", "none", 0, False),
+    ("c3x_cutting_template", "c3x", "comma 3x", "horizontal", 41.2, False),
+    ("c4_cutting_template", "c4", "comma four", "horizontal", 35.0, False),
+    ("c3x_cutting_template_solid", "c3x", "comma 3x (solid)", "none", 0, True),
+    ("c4_cutting_template_solid", "c4", "comma four (solid)", "none", 0, True),
+)
+CUTTING_PREVIEWS = ("c3_cutting_template", "c3x_cutting_template", "c4_cutting_template")
+# Seconds per task kind, used until a previous run has recorded real timings.
+DEFAULT_COSTS = {
+    "orient": 2.0,
+    "project": 3.0,
+    "trace": 1.0,
+    "mega": 60.0,
+    "footprint": 5.0,
+    "cutting": 40.0,
+    "preview": 1.0,
+}
+
+
+@dataclass(frozen=True)
+class Task:
+    name: str
+    commands: tuple[tuple[str, ...], ...]
+    inputs: tuple[Path, ...]
+    outputs: tuple[Path, ...]
+
+    @property
+    def kind(self) -> str:
+        return self.name.split(":", 1)[0]
+
+
+@dataclass
+class Report:
+    wall: float = 0.0
+    busy: float = 0.0
+    active_jobs: int = 0
+    peak_jobs: int = 0
+    ran: list[str] = field(default_factory=list)
+    up_to_date: list[str] = field(default_factory=list)
+    failed: list[str] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+def tool(name: str) -> str:
+    return str(TOOLS_DIR / name)
+
+
+def mount_tasks(python: str, openscad: str) -> list[Task]:
+    tasks = []
+    for mount, source, flip, scad in MOUNT_SOURCES:
+        oriented = BUILD_DIR / f"{mount}_mount.stl"
+        raw_svg = BUILD_DIR / f"{mount}_mount.raw.svg"
+        svg = BUILD_DIR / f"{mount}_mount.svg"
+        orient = (python, tool("orient_stl.py"), *(("--flip",) if flip else ()), source, str(oriented))
+        tasks.append(
+            Task(f"orient:{mount}", (orient,), (ROOT / source, TOOLS_DIR / "orient_stl.py"), (oriented,))
+        )
+        tasks.append(
+            Task(
+                f"project:{mount}",
+                (
+                    (openscad, "-D", f'filename="{oriented}"', "-o", str(raw_svg), tool(scad)),
+                    (python, tool("normalize_svg.py"), str(raw_svg), str(svg)),
+                ),
+                (oriented, TOOLS_DIR / scad, TOOLS_DIR / "normalize_svg.py"),
+                (svg, svg.with_suffix(".json")),
+            )
+        )
+    return tasks
+
+
+def trace_tasks(python: str) -> list[Task]:
+    tasks = []
+    scripts = TOOLS_DIR / "vehicle_specific"
+    for vehicle in build_mega_templates.vehicle_dirs():
+        vehicle_dir = ROOT / "vehicles" / vehicle
+        scan = vehicle_dir / "ai" / "annotated_scan.png"
+        gen = vehicle_dir / "gen"
+        if not scan.exists():
+            continue
+        # raw_trace.svg and trace.svg are intermediates in the Makefile, so like
+        # make only rebuild the chain when offsets.svg is missing or older than
+        # the annotation; the checked-in offsets are otherwise left alone.
+        offsets = gen / "offsets.svg"
+        if offsets.exists() and offsets.stat().st_mtime >= scan.stat().st_mtime:
+            continue
+        steps = (
+            ("raw", "process_annotation.py", scan, gen / "raw_trace.svg", (str(scan), str(gen / "raw_trace.svg"))),
+            ("refine", "refine_trace.py", gen / "raw_trace.svg", gen / "trace.svg", (str(gen / "raw_trace.svg"),)),
+            ("offsets", "generate_offsets.py", gen / "trace.svg", gen / "offsets.svg", (str(gen / "trace.svg"),)),
+        )
+        for step, script, source, output, args in steps:
+            tasks.append(
+                Task(
+                    f"trace:{vehicle}:{step}",
+                    ((python, str(scripts / script), *args),),
+                    (source, scripts / script),
+                    (output,),
+                )
+            )
+    return tasks
+
+
+def mega_tasks(python: str, typst: str) -> list[Task]:
+    plan = build_mega_templates.output_plan(list(build_mega_templates.GROUPS))
+    tasks = []
+    for group, entry in plan["groups"].items():
+        stamp = ROOT / entry["stamp"]
+        command = (
+            python,
+            tool("build_mega_templates.py"),
+            "--group",
+            group,
+            "--typst",
+            typst,
+            "--stamp",
+            str(stamp),
+        )
+        tasks.append(
+            Task(
+                f"mega:{group}",
+                (command,),
+                tuple(ROOT / dep for dep in entry["deps"]),
+                (stamp,),
+            )
+        )
+    return tasks
+
+
+def cutting_tasks(python: str, openscad: str) -> list[Task]:
+    scad = TOOLS_DIR / "cutting_template.scad"
+    tasks = []
+    for mount in sorted({mount for _stem, mount, *_rest in CUTTING_TEMPLATES}):
+        oriented = BUILD_DIR / f"{mount}_mount.stl"
+        footprint = BUILD_DIR / f"{mount}_footprint.dxf"
+        command = (
+            openscad,
+            "-D",
+            f'filename="{oriented}"',
+            "-D",
+            "export_footprint=true",
+            "-o",
+            str(footprint),
+            str(scad),
+        )
+        tasks.append(Task(f"footprint:{mount}", (command,), (oriented, scad), (footprint,)))
+
+    for stem, mount, label, bridge_type, bridge_gap, solid in CUTTING_TEMPLATES:
+        oriented = BUILD_DIR / f"{mount}_mount.stl"
+        footprint = BUILD_DIR / f"{mount}_footprint.dxf"
+        flags = (
+            "-D",
+            f'filename="{oriented}"',
+            "-D",
+            f'footprint_file="{footprint}"',
+            "-D",
+            f'mount_name="{label}"',
+            "-D",
+            f'bridge_type="{bridge_type}"',
+            "-D",
+            f"bridge_gap={bridge_gap}",
+        )
+        inputs = (oriented, footprint, scad)
+        stl = BUILD_DIR / f"{stem}.stl"
+        is_solid = "true" if solid else "false"
+        tasks.append(
+            Task(
+                f"cutting:{stem}",
+                ((openscad, *flags, "-D", f"is_solid={is_solid}", "-o", str(stl), str(scad)),),
+                inputs,
+                (stl,),
+            )
+        )
+        if stem in CUTTING_PREVIEWS:
+            preview = BUILD_DIR / f"{stem}_preview.png"
+            command = (python, tool("render_preview.py"), str(stl), str(preview))
+            tasks.append(Task(f"preview:{stem}", (command,), (stl, TOOLS_DIR / "render_preview.py"), (preview,)))
+    return tasks
+
+
+def pipeline_tasks(python: str, typst: str, openscad: str) -> list[Task]:
+    return [
+        *mount_tasks(python, openscad),
+        *trace_tasks(python),
+        *mega_tasks(python, typst),
+        *cutting_tasks(python, openscad),
+    ]
+
+
+def dependencies(tasks: list[Task]) -> dict[str, set[str]]:
+    """Link each task to the tasks that produce any of its inputs."""
+    producers = {output: task.name for task in tasks for output in task.outputs}
+    return {
+        task.name: {producers[path] for path in task.inputs if path in producers} - {task.name}
+        for task in tasks
+    }
+
+
+def select_tasks(tasks: list[Task], deps: dict[str, set[str]], patterns: list[str]) -> list[Task]:
+    wanted = {task.name for task in tasks if any(fnmatch.fnmatch(task.name, p) for p in patterns)}
+    pending = list(wanted)
+    while pending:
+        for dep in deps[pending.pop()]:
+            if dep not in wanted:
+                wanted.add(dep)
+                pending.append(dep)
+    return [task for task in tasks if task.name in wanted]
+
+
+def load_timings() -> dict[str, float]:
+    if not TIMINGS_PATH.exists():
+        return {}
+    return json.loads(TIMINGS_PATH.read_text())
+
+
+def save_timings(timings: dict[str, float]) -> None:
+    merged = {**load_timings(), **timings}
+    build_mega_templates.write_if_changed(
+        TIMINGS_PATH, json.dumps(merged, indent=2, sort_keys=True) + "\n"
+    )
+
+
+def critical_paths(tasks: list[Task], deps: dict[str, set[str]], costs: dict[str, float]) -> dict[str, float]:
+    """Return each task's cost plus the longest chain of work waiting on it."""
+    dependents: dict[str, set[str]] = {task.name: set() for task in tasks}
+    for name, upstream in deps.items():
+        for dep in upstream:
+            dependents[dep].add(name)
+
+    memo: dict[str, float] = {}
+
+    def visit(name: str) -> float:
+        if name not in memo:
+            memo[name] = costs[name] + max((visit(child) for child in dependents[name]), default=0.0)
+        return memo[name]
+
+    for task in tasks:
+        visit(task.name)
+    return memo
+
+
+def up_to_date(task: Task) -> bool:
+    if not all(path.exists() for path in task.outputs):
+        return False
+    newest_input = max((path.stat().st_mtime for path in task.inputs if path.exists()), default=0.0)
+    return min(path.stat().st_mtime for path in task.outputs) >= newest_input
+
+
+class JobServer:
+    """Client for the GNU make jobserver advertised in ``MAKEFLAGS``.
+
+    This process already holds one implicit job slot; every further concurrent
+    task borrows a token from make and returns it when it finishes.
+    """
+
+    def __init__(self, read_fd: int, write_fd: int) -> None:
+        self.read_fd = read_fd
+        self.write_fd = write_fd
+        self.implicit_free = True
+
+    @classmethod
+    def from_environment(cls) -> JobServer | None:
+        flags = os.environ.get("MAKEFLAGS", "")
+        match = re.search(r"--jobserver-(?:auth|fds)=(\S+)", flags)
+        if match is None:
+            return None
+        auth = match.group(1)
+        try:
+            if auth.startswith("fifo:"):
+                fd = os.open(auth.removeprefix("fifo:"), os.O_RDWR)
+                return cls(fd, fd)
+            read_fd, write_fd = (int(value) for value in auth.split(","))
+            os.fstat(read_fd)
+            os.fstat(write_fd)
+            return cls(read_fd, write_fd)
+        except (OSError, ValueError):
+            # The recipe was not marked with `+`, so make closed the pipe.
+            print("warning: make jobserver unavailable; using --jobs only", file=sys.stderr)
+            return None
+
+    async def acquire(self) -> bytes | None:
+        if self.implicit_free:
+            self.implicit_free = False
+            return None
+        return await asyncio.to_thread(self.read_token)
+
+    def read_token(self) -> bytes:
+        # make may hand out a non-blocking pipe; wait for a token in a thread.
+        while True:
+            select.select([self.read_fd], [], [])
+            try:
+                return os.read(self.read_fd, 1)
+            except BlockingIOError:
+                continue
+
+    def release(self, token: bytes | None) -> None:
+        if token is None:
+            self.implicit_free = True
+        else:
+            os.write(self.write_fd, token)
+
+
+async def execute(task: Task, jobserver: JobServer | None, report: Report) -> float:
+    token = await jobserver.acquire() if jobserver else None
+    report.active_jobs += 1
+    report.peak_jobs = max(report.peak_jobs, report.active_jobs)
+    try:
+        for output in task.outputs:
+            output.parent.mkdir(parents=True, exist_ok=True)
+        print(f"[start] {task.name}", flush=True)
+        started = time.perf_counter()
+        for command in task.commands:
+            process = await asyncio.create_subprocess_exec(*command, cwd=ROOT)
+            if await process.wait() != 0:
+                raise RuntimeError(f"{task.name}: command failed: {' '.join(command)}")
+        elapsed = time.perf_counter() - started
+        print(f"[done] {task.name} {elapsed:.1f}s", flush=True)
+        return elapsed
+    finally:
+        report.active_jobs -= 1
+        if jobserver:
+            jobserver.release(token)
+
+
+async def run_pipeline(
+    tasks: list[Task],
+    jobs: int,
+    jobserver: JobServer | None,
+    force: bool = False,
+) -> Report:
+    deps = dependencies(tasks)
+    timings = load_timings()
+    costs = {task.name: timings.get(task.name, DEFAULT_COSTS[task.kind]) for task in tasks}
+    priority = critical_paths(tasks, deps, costs)
+    by_name = {task.name: task for task in tasks}
+    waiting = {name: set(upstream) for name, upstream in deps.items()}
+    rebuilt: set[str] = set()
+    report = Report()
+
+    ready: list[tuple[float, str]] = []
+
+    def release_dependents(name: str) -> None:
+        for other, upstream in waiting.items():
+            if name in upstream:
+                upstream.discard(name)
+                if not upstream:
+                    heapq.heappush(ready, (-priority[other], other))
+
+    for name, upstream in waiting.items():
+        if not upstream:
+            heapq.heappush(ready, (-priority[name], name))
+
+    running: dict[asyncio.Task[float], str] = {}
+    started = time.perf_counter()
+    while ready or running:
+        while ready and len(running) < jobs and not report.failed:
+            _, name = heapq.heappop(ready)
+            task = by_name[name]
+            stale = force or bool(deps[name] & rebuilt) or not up_to_date(task)
+            if not stale:
+                report.up_to_date.append(name)
+                release_dependents(name)
+                continue
+            running[asyncio.create_task(execute(task, jobserver, report))] = name
+
+        if not running:
+            if report.failed:
+                break
+            continue
+
+        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+        for finished in done:
+            name = running.pop(finished)
+            try:
+                elapsed = finished.result()
+            except Exception as error:
+                print(f"error: {error}", file=sys.stderr)
+                report.failed.append(name)
+                continue
+            report.ran.append(name)
+            report.busy += elapsed
+            report.timings[name] = round(elapsed, 3)
+            rebuilt.add(name)
+            release_dependents(name)
+
+    report.wall = time.perf_counter() - started
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Build every template stage as one DAG with critical-path scheduling."
+    )
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--typst", default="typst")
+    parser.add_argument("--openscad", default="openscad")
+    parser.add_argument(
+        "--only",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Build tasks matching this glob (e.g. 'mega:*') plus their dependencies. May be repeated.",
+    )
+    parser.add_argument("--force", action="store_true", help="Rebuild tasks even when up to date.")
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print tasks in scheduling priority order without running them.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    tasks = pipeline_tasks(sys.executable, args.typst, args.openscad)
+    if args.only:
+        tasks = select_tasks(tasks, dependencies(tasks), args.only)
+
+    if args.dry_run:
+        deps = dependencies(tasks)
+        timings = load_timings()
+        costs = {task.name: timings.get(task.name, DEFAULT_COSTS[task.kind]) for task in tasks}
+        priority = critical_paths(tasks, deps, costs)
+        for task in sorted(tasks, key=lambda task: -priority[task.name]):
+            state = "up-to-date" if up_to_date(task) else "stale"
+            print(f"task={task.name} critical_path_s={priority[task.name]:.1f} state={state}")
+        return 0
+
+    jobserver = JobServer.from_environment()
+    report = asyncio.run(run_pipeline(tasks, max(1, args.jobs), jobserver, args.force))
+    save_timings(report.timings)
+
+    parallelism = report.busy / report.wall if report.wall else 0.0
+    print(f"tasks={len(tasks)} ran={len(report.ran)} up_to_date={len(report.up_to_date)}")
+    print(f"jobserver={'yes' if jobserver else 'no'} jobs={args.jobs} peak_jobs={report.peak_jobs}")
+    print(f"wall_seconds={report.wall:.2f} busy_seconds={report.busy:.2f} parallelism={parallelism:.2f}")
+    if report.failed:
+        print(f"failed={' '.join(report.failed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import tarfile
+import zipfile
+from pathlib import Path
+
+from pypdf import PdfReader, PdfWriter
+
+import build_mega_templates
+
+
+ROOT = build_mega_templates.ROOT
+RELEASE_DIR = build_mega_templates.BUILD_DIR / "release"
+PAPERS = ("letter", "a4")
+
+
+def paper_groups(paper: str) -> list[str]:
+    return [f"universal-{paper}", f"vehicle-{paper}"]
+
+
+def page_label(render: build_mega_templates.Render) -> str:
+    return str(render.pdf.relative_to(build_mega_templates.BUILD_DIR).with_suffix(""))
+
+
+class Archive:
+    """Minimal common interface over zip and tar so files stream in one pass."""
+
+    def __init__(self, path: Path, kind: str) -> None:
+        self.kind = kind
+        if kind == "zip":
+            self.handle = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED)
+        else:
+            self.handle = tarfile.open(path, "w:gz")
+
+    def add(self, path: Path) -> None:
+        arcname = str(path.relative_to(build_mega_templates.BUILD_DIR))
+        if self.kind == "tar":
+            self.handle.add(path, arcname=arcname)
+        elif path.suffix == ".png":
+            # PNGs are already deflated; storing avoids burning CPU for nothing.
+            self.handle.write(path, arcname, compress_type=zipfile.ZIP_STORED)
+        else:
+            self.handle.write(path, arcname)
+
+    def close(self) -> None:
+        self.handle.close()
+
+
+def build_bundle(paper: str, archive_kind: str) -> tuple[Path, Path, int, int]:
+    RELEASE_DIR.mkdir(parents=True, exist_ok=True)
+    catalogue_path = RELEASE_DIR / f"templates_{paper}.pdf"
+    suffix = "zip" if archive_kind == "zip" else "tar.gz"
+    archive_path = RELEASE_DIR / f"templates_{paper}.{suffix}"
+
+    writer = PdfWriter()
+    archive = Archive(archive_path, archive_kind)
+    individual_bytes = 0
+    try:
+        for group in paper_groups(paper):
+            group_outline = None
+            for render in build_mega_templates.iter_group_renders(group, git_args={}):
+                if not render.pdf.exists():
+                    raise RuntimeError(f"missing rendered PDF: {render.pdf}")
+                page_index = len(writer.pages)
+                page = writer.add_page(PdfReader(render.pdf).pages[0])
+                # The group bookmark needs a page that is already in the writer;
+                # an index past the end never resolves to a destination.
+                if group_outline is None:
+                    group_outline = writer.add_outline_item(group, page)
+                writer.set_page_label(page_index, page_index, prefix=page_label(render))
+                writer.add_outline_item(page_label(render), page, parent=group_outline)
+
+                for path in (render.pdf, render.png, render.bw_png):
+                    if path.exists():
+                        archive.add(path)
+                        individual_bytes += path.stat().st_size
+    finally:
+        archive.close()
+
+    # Every split page carries its own copy of the font subset, grid tiling and
+    # car illustration; merging identical objects keeps one copy of each.
+    writer.compress_identical_objects()
+    with catalogue_path.open("wb") as file:
+        writer.write(file)
+    return catalogue_path, archive_path, len(writer.pages), individual_bytes
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Bundle split template PDFs into per-paper catalogues and archives."
+    )
+    parser.add_argument(
+        "--paper",
+        dest="papers",
+        action="append",
+        choices=PAPERS,
+        help="Paper size to bundle. May be repeated; defaults to all.",
+    )
+    parser.add_argument("--archive", choices=("zip", "tar"), default="zip")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    for paper in args.papers or PAPERS:
+        catalogue, archive, pages, individual_bytes = build_bundle(paper, args.archive)
+        print(f"paper={paper}")
+        print(f"pages={pages}")
+        print(f"individual_bytes={individual_bytes}")
+        print(f"catalogue={catalogue.relative_to(ROOT)} bytes={catalogue.stat().st_size}")
+        print(f"archive={archive.relative_to(ROOT)} bytes={archive.stat().st_size}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import build_mega_templates
+
+
+ROOT = build_mega_templates.ROOT
+BUILD_DIR = build_mega_templates.BUILD_DIR
+PT_TO_MM = 25.4 / 72
+DEFAULT_TOLERANCE_MM = 0.1
+# Typst's `red`, used for the reference line and clearance arcs.
+TYPST_RED = (1.0, 0x41 / 255, 0x36 / 255)
+BLACK = (0.0, 0.0, 0.0)
+# OpenSCAD's SVG export fills footprints with `lightgray`.
+LIGHTGRAY = (0xD3 / 255,) * 3
+COLOR_TOLERANCE = 0.02
+REFERENCE_LINE_MM = 150.0
+CARD_SIZE_MM = (53.98, 85.60)
+
+Matrix = tuple[float, float, float, float, float, float]
+Box = tuple[float, float, float, float]
+IDENTITY: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+
+@dataclass(frozen=True)
+class PageExpectation:
+    pdf: Path
+    offsets_mm: tuple[float, ...]
+    mount_size_mm: tuple[float, float] | None
+
+
+@dataclass(frozen=True)
+class Segment:
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+    width_mm: float
+    color: tuple[float, ...]
+
+    @property
+    def length(self) -> float:
+        return math.hypot(self.x1 - self.x0, self.y1 - self.y0)
+
+
+@dataclass
+class PageGeometry:
+    """Painted geometry in millimetres, measured from the page's top-left."""
+
+    width_mm: float
+    height_mm: float
+    segments: list[Segment] = field(default_factory=list)
+    stroked: list[tuple[Box, tuple[float, ...]]] = field(default_factory=list)
+    filled: list[tuple[Box, tuple[float, ...]]] = field(default_factory=list)
+    placements: list[Box] = field(default_factory=list)
+
+
+def multiply(m: Matrix, n: Matrix) -> Matrix:
+    a, b, c, d, e, f = m
+    p, q, r, s, t, u = n
+    return (
+        a * p + b * r,
+        a * q + b * s,
+        c * p + d * r,
+        c * q + d * s,
+        e * p + f * r + t,
+        e * q + f * s + u,
+    )
+
+
+def apply(m: Matrix, x: float, y: float) -> tuple[float, float]:
+    a, b, c, d, e, f = m
+    return a * x + c * y + e, b * x + d * y + f
+
+
+def as_color(operands: list) -> tuple[float, ...] | None:
+    values = [float(value) for value in operands if isinstance(value, (int, float))]
+    if len(values) == 1:
+        return (values[0],) * 3
+    if len(values) == 3:
+        return tuple(values)
+    if len(values) == 4:
+        c, m, y, k = values
+        return ((1 - c) * (1 - k), (1 - m) * (1 - k), (1 - y) * (1 - k))
+    return None
+
+
+def same_color(a: tuple[float, ...], b: tuple[float, ...]) -> bool:
+    return all(abs(x - y) <= COLOR_TOLERANCE for x, y in zip(a, b, strict=True))
+
+
+def bounds(points: list[tuple[float, float]]) -> Box:
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+class ContentWalker:
+    """Interpret the path, colour and transform operators of a page.
+
+    Form XObjects are followed recursively, and their placed bounding boxes
+    are recorded alongside image XObjects so SVG embeds can be located
+    whether or not Typst inlines them.
+    """
+
+    def __init__(self, page) -> None:
+        box = page.mediabox
+        self.top = float(box.top)
+        self.left = float(box.left)
+        self.geometry = PageGeometry(
+            width_mm=float(box.width) * PT_TO_MM, height_mm=float(box.height) * PT_TO_MM
+        )
+        self.reader = page.pdf
+
+    def to_mm(self, ctm: Matrix, x: float, y: float) -> tuple[float, float]:
+        px, py = apply(ctm, x, y)
+        return (px - self.left) * PT_TO_MM, (self.top - py) * PT_TO_MM
+
+    def walk(self, content, resources, ctm: Matrix, depth: int = 0) -> None:
+        from pypdf.generic import ContentStream
+
+        if content is None or depth > 8:
+            return
+        stack = []
+        stroke_color: tuple[float, ...] = BLACK
+        fill_color: tuple[float, ...] = BLACK
+        line_width = 1.0
+        subpaths: list[list[tuple[float, float]]] = []
+        lines: list[tuple[tuple[float, float], tuple[float, float]]] = []
+        current: list[tuple[float, float]] = []
+
+        def flush(paint: bytes) -> None:
+            nonlocal subpaths, lines, current
+            points = [point for path in subpaths + [current] for point in path]
+            if points and paint in (b"S", b"s", b"B", b"B*", b"b", b"b*"):
+                scale = math.sqrt(abs(ctm[0] * ctm[3] - ctm[1] * ctm[2]))
+                width_mm = line_width * scale * PT_TO_MM
+                for start, end in lines:
+                    self.geometry.segments.append(Segment(*start, *end, width_mm, stroke_color))
+                self.geometry.stroked.append((bounds(points), stroke_color))
+            if points and paint in (b"f", b"F", b"f*", b"B", b"B*", b"b", b"b*"):
+                self.geometry.filled.append((bounds(points), fill_color))
+            subpaths, lines, current = [], [], []
+
+        for operands, operator in ContentStream(content, self.reader).operations:
+            if operator == b"q":
+                stack.append((ctm, stroke_color, fill_color, line_width))
+            elif operator == b"Q" and stack:
+                ctm, stroke_color, fill_color, line_width = stack.pop()
+            elif operator == b"cm":
+                ctm = multiply(tuple(float(value) for value in operands), ctm)
+            elif operator == b"w":
+                line_width = float(operands[0])
+            elif operator in (b"RG", b"G", b"K", b"SC", b"SCN"):
+                stroke_color = as_color(operands) or stroke_color
+            elif operator in (b"rg", b"g", b"k", b"sc", b"scn"):
+                fill_color = as_color(operands) or fill_color
+            elif operator == b"m":
+                if current:
+                    subpaths.append(current)
+                current = [self.to_mm(ctm, float(operands[0]), float(operands[1]))]
+            elif operator == b"l" and current:
+                point = self.to_mm(ctm, float(operands[0]), float(operands[1]))
+                lines.append((current[-1], point))
+                current.append(point)
+            elif operator in (b"c", b"v", b"y") and current:
+                values = [float(value) for value in operands]
+                current.extend(
+                    self.to_mm(ctm, values[i], values[i + 1]) for i in range(0, len(values), 2)
+                )
+            elif operator == b"re":
+                x, y, w, h = (float(value) for value in operands)
+                if current:
+                    subpaths.append(current)
+                current = []
+                corners = ((x, y), (x + w, y), (x + w, y + h), (x, y + h))
+                subpaths.append([self.to_mm(ctm, px, py) for px, py in corners])
+            elif operator in (b"S", b"s", b"f", b"F", b"f*", b"B", b"B*", b"b", b"b*", b"n"):
+                flush(operator)
+            elif operator == b"Do":
+                self.place(operands[0], resources, ctm, depth)
+
+    def place(self, name, resources, ctm: Matrix, depth: int) -> None:
+        xobjects = resources.get_object().get("/XObject") if resources else None
+        if xobjects is None or name not in xobjects.get_object():
+            return
+        xobjects = xobjects.get_object()
+        xobject = xobjects[name].get_object()
+        if xobject.get("/Subtype") == "/Image":
+            corners = [self.to_mm(ctm, x, y) for x, y in ((0, 0), (1, 0), (1, 1), (0, 1))]
+            self.geometry.placements.append(bounds(corners))
+            return
+        matrix = tuple(float(value) for value in xobject.get("/Matrix", IDENTITY))
+        form_ctm = multiply(matrix, ctm)
+        x0, y0, x1, y1 = (float(value) for value in xobject["/BBox"])
+        corners = [self.to_mm(form_ctm, x, y) for x, y in ((x0, y0), (x1, y0), (x1, y1), (x0, y1))]
+        self.geometry.placements.append(bounds(corners))
+        self.walk(xobject, xobject.get("/Resources", resources), form_ctm, depth + 1)
+
+
+def measure_page(pdf: Path) -> PageGeometry:
+    from pypdf import PdfReader
+
+    page = PdfReader(pdf).pages[0]
+    walker = ContentWalker(page)
+    walker.walk(page.get_contents(), page.get("/Resources"), IDENTITY)
+    return walker.geometry
+
+
+def close(a: float, b: float, tolerance: float) -> bool:
+    return abs(a - b) <= tolerance
+
+
+def check_page(expectation: PageExpectation, tolerance: float) -> list[str]:
+    geometry = measure_page(expectation.pdf)
+    center_x = geometry.width_mm / 2
+    errors: list[str] = []
+
+    reference = [
+        segment
+        for segment in geometry.segments
+        if same_color(segment.color, TYPST_RED)
+        and close(segment.y0, segment.y1, tolerance)
+        and close(segment.length, REFERENCE_LINE_MM, tolerance)
+    ]
+    if len(reference) != 1:
+        return [f"expected one {REFERENCE_LINE_MM:g}mm red reference line, found {len(reference)}"]
+    line_y = reference[0].y0
+
+    # Dimension lines run straight down the page centre from the reference
+    # line to the top of each mount copy.
+    dimensions = []
+    for segment in geometry.segments:
+        if not same_color(segment.color, BLACK) or not close(segment.x0, segment.x1, tolerance):
+            continue
+        if not close(segment.x0, center_x, tolerance):
+            continue
+        top, bottom = sorted((segment.y0, segment.y1))
+        if close(top, line_y, tolerance):
+            dimensions.append(bottom - top)
+    for offset in expectation.offsets_mm:
+        if not any(close(length, offset, tolerance) for length in dimensions):
+            found = ", ".join(f"{length:.2f}" for length in sorted(dimensions)) or "none"
+            errors.append(f"no {offset:g}mm dimension line (found: {found})")
+
+    candidates = list(geometry.placements)
+    candidates.extend(box for box, color in geometry.filled if same_color(color, LIGHTGRAY))
+    if expectation.mount_size_mm is not None:
+        width, height = expectation.mount_size_mm
+        candidates = [
+            box
+            for box in candidates
+            if close(box[2] - box[0], width, tolerance) and close(box[3] - box[1], height, tolerance)
+        ]
+    mount_tops = [box[1] for box in candidates if close((box[0] + box[2]) / 2, center_x, tolerance)]
+    for offset in expectation.offsets_mm:
+        if not any(close(top - line_y, offset, tolerance) for top in mount_tops):
+            errors.append(f"no mount placed {offset:g}mm below the reference line")
+
+    card_width, card_height = CARD_SIZE_MM
+    if not any(
+        close(box[2] - box[0], card_width, tolerance) and close(box[3] - box[1], card_height, tolerance)
+        for box, color in geometry.stroked
+        if same_color(color, BLACK)
+    ):
+        errors.append(f"no {card_width}x{card_height}mm credit card box")
+    return errors
+
+
+def check_task(args: tuple[PageExpectation, float]) -> tuple[Path, list[str]]:
+    expectation, tolerance = args
+    try:
+        return expectation.pdf, check_page(expectation, tolerance)
+    except Exception as error:
+        return expectation.pdf, [f"could not parse: {error}"]
+
+
+def millimetres(value: str) -> float:
+    if not value.endswith("mm"):
+        raise ValueError(f"expected a length in mm: {value}")
+    return float(value.removesuffix("mm"))
+
+
+def mount_size(render: build_mega_templates.Render) -> tuple[float, float] | None:
+    # Present whenever normalize_svg.py's sidecar exists; see mount_size_args.
+    if "svg-width" not in render.args or "svg-height" not in render.args:
+        return None
+    return millimetres(render.args["svg-width"]), millimetres(render.args["svg-height"])
+
+
+def expectations(groups: list[str]) -> list[PageExpectation]:
+    pages = []
+    for group in groups:
+        for render in build_mega_templates.iter_group_renders(group, git_args={}):
+            offsets = [millimetres(render.args["clearance-offset"])]
+            secondary = render.args.get("secondary-clearance-offset")
+            if secondary is not None and millimetres(secondary) != offsets[0]:
+                offsets.append(millimetres(secondary))
+            pages.append(PageExpectation(render.pdf, tuple(offsets), mount_size(render)))
+    return pages
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Assert clearance offsets, mount placement and card scale from PDF vector data."
+    )
+    parser.add_argument(
+        "--group",
+        dest="groups",
+        action="append",
+        choices=build_mega_templates.GROUPS,
+        help="Group to check. May be repeated; defaults to all groups.",
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE_MM)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    pages = expectations(args.groups or list(build_mega_templates.GROUPS))
+    missing = [page.pdf for page in pages if not page.pdf.exists()]
+    if missing:
+        for pdf in missing:
+            print(f"missing={pdf.relative_to(ROOT)}", file=sys.stderr)
+        return 2
+
+    started = time.perf_counter()
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        for pdf, errors in executor.map(check_task, [(page, args.tolerance) for page in pages]):
+            if errors:
+                failed += 1
+                for error in errors:
+                    print(f"fail={pdf.relative_to(ROOT)} {error}")
+    elapsed = time.perf_counter() - started
+
+    print(f"pages={len(pages)} failed={failed}")
+    print(f"seconds={elapsed:.2f} ms_per_page={1000 * elapsed / max(len(pages), 1):.1f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parents[1]
+VENDOR_DIR = ROOT / "vendor"
+INDEX_PATH = ROOT / "build" / "vendor_index.json"
+# Included by the Makefile, so the mount sources it builds from always match
+# the picks below. Checked in; `make index-vendor` regenerates it.
+CANONICAL_MAKE = VENDOR_DIR / "canonical.mk"
+# Matches tools/project_mount.scad, which slices just above the build plate.
+SECTION_Z_MM = 0.1
+# Fingerprint values (areas, extents, log Hu moments) within this relative
+# tolerance are treated as the same physical footprint.
+DUPLICATE_TOLERANCE = 0.02
+INDEX_VERSION = 1
+
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def footprint(path: Path):
+    """Orient an STL like the build does and return its bottom cross-section."""
+    import shapely
+    import trimesh
+    from shapely.geometry import MultiLineString, Polygon
+    from shapely.ops import polygonize
+
+    import orient_stl
+
+    mesh = orient_stl.load_stl(str(path))
+    with contextlib.redirect_stdout(io.StringIO()):
+        transform = orient_stl.orientation_transform(mesh)
+    mesh.apply_transform(transform)
+
+    segments = trimesh.intersections.mesh_plane(mesh, [0, 0, 1], [0, 0, SECTION_Z_MM])
+    # Snap section endpoints so adjacent segments share exact coordinates.
+    lines = np.round(segments[:, :, :2], 4).tolist()
+    region = shapely.GeometryCollection()
+    # Even-odd fill: every closed ring toggles inside/outside, which turns
+    # nested rings into holes the same way OpenSCAD's projection does.
+    for face in polygonize(shapely.node(MultiLineString(lines))):
+        region = region.symmetric_difference(Polygon(face.exterior))
+    return region
+
+
+def hu_moments(region) -> list[float]:
+    import cv2
+
+    if region.is_empty:
+        return [0.0] * 7
+    largest = max(getattr(region, "geoms", [region]), key=lambda geom: geom.area)
+    contour = np.asarray(largest.exterior.coords, dtype=np.float32)
+    hu = cv2.HuMoments(cv2.moments(contour)).ravel()
+    # Log scale so the seven invariants are comparable in magnitude.
+    return [float(-np.sign(value) * np.log10(abs(value))) if value else 0.0 for value in hu]
+
+
+def fingerprint(path: Path) -> dict:
+    region = footprint(path)
+    min_x, min_y, max_x, max_y = region.bounds if not region.is_empty else (0, 0, 0, 0)
+    outline = region.simplify(0.2) if not region.is_empty else region
+    return {
+        "area": round(region.area, 3),
+        "hull_area": round(region.convex_hull.area, 3),
+        "width": round(max_x - min_x, 3),
+        "height": round(max_y - min_y, 3),
+        "rings": len(getattr(region, "geoms", [region])) if not region.is_empty else 0,
+        "hu": [round(value, 4) for value in hu_moments(region)],
+        "outline": outline.wkt,
+    }
+
+
+def index_entry(path: Path) -> tuple[str, dict]:
+    return str(path.relative_to(ROOT)), {"sha256": file_digest(path), "fingerprint": fingerprint(path)}
+
+
+def load_index() -> dict[str, dict]:
+    if not INDEX_PATH.exists():
+        return {}
+    data = json.loads(INDEX_PATH.read_text())
+    if data.get("version") != INDEX_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def save_index(files: dict[str, dict]) -> None:
+    INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
+    INDEX_PATH.write_text(
+        json.dumps({"version": INDEX_VERSION, "files": files}, indent=2, sort_keys=True) + "\n"
+    )
+
+
+def update_index(paths: list[Path], jobs: int) -> tuple[dict[str, dict], int]:
+    files = load_index()
+    current = {str(path.relative_to(ROOT)) for path in paths}
+    files = {key: value for key, value in files.items() if key in current}
+    stale = [
+        path
+        for path in paths
+        if files.get(str(path.relative_to(ROOT)), {}).get("sha256") != file_digest(path)
+    ]
+    if stale:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for key, entry in executor.map(index_entry, stale):
+                files[key] = entry
+        save_index(files)
+    return files, len(stale)
+
+
+def same_footprint(a: dict, b: dict, tolerance: float) -> bool:
+    for key in ("area", "hull_area", "width", "height"):
+        scale = max(abs(a[key]), abs(b[key]), 1e-9)
+        if abs(a[key] - b[key]) / scale > tolerance:
+            return False
+    # Only the first two Hu invariants are compared: the higher-order ones are
+    # ~0 for the mostly symmetric mounts, so their log values are pure noise.
+    scale = max(sum(abs(value) for value in a["hu"][:2]), 1e-9)
+    distance = sum(abs(x - y) for x, y in zip(a["hu"][:2], b["hu"][:2], strict=True))
+    return distance / scale <= tolerance
+
+
+def cluster(keys: list[str], files: dict[str, dict], tolerance: float) -> list[list[str]]:
+    clusters: list[list[str]] = []
+    for key in sorted(keys):
+        for members in clusters:
+            if same_footprint(files[members[0]]["fingerprint"], files[key]["fingerprint"], tolerance):
+                members.append(key)
+                break
+        else:
+            clusters.append([key])
+    return clusters
+
+
+def area(key: str, files: dict[str, dict]) -> float:
+    return files[key]["fingerprint"]["area"]
+
+
+def representative(members: list[str], files: dict[str, dict]) -> str:
+    """Pick one file for a cluster of duplicate exports: the fullest, then by name."""
+    return max(sorted(members), key=lambda key: area(key, files))
+
+
+def canonical(clusters: list[list[str]], files: dict[str, dict]) -> str:
+    # Each cluster is one physical part. The part with the fullest bottom
+    # contact area is the one adhesive is applied to; the others in a family
+    # are spacers, shims, or partial prints.
+    picks = [representative(members, files) for members in clusters]
+    return max(picks, key=lambda key: area(key, files))
+
+
+def families(files: dict[str, dict]) -> dict[str, list[str]]:
+    grouped: dict[str, list[str]] = {}
+    for key in files:
+        grouped.setdefault(str(Path(key).parent), []).append(key)
+    return grouped
+
+
+def source_variable(family: str) -> str:
+    """Return the Makefile variable for a family, e.g. KONIK_BATMAN_SOURCE."""
+    return "_".join(Path(family).relative_to(VENDOR_DIR.name).parts).upper() + "_SOURCE"
+
+
+def make_fragment(clustered: dict[str, list[list[str]]], files: dict[str, dict]) -> str:
+    lines = ["# Generated by tools/index_vendor_stls.py --write-make. Do not edit.", ""]
+    for family, clusters in sorted(clustered.items()):
+        lines.append(f"{source_variable(family)} := {canonical(clusters, files)}")
+    return "\n".join(lines) + "\n"
+
+
+def write_if_changed(path: Path, text: str) -> bool:
+    if path.exists() and path.read_text() == text:
+        return False
+    path.write_text(text)
+    return True
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Fingerprint vendor STL footprints, cluster duplicates, and pick canonical files."
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--tolerance", type=float, default=DUPLICATE_TOLERANCE)
+    parser.add_argument(
+        "--print-canonical",
+        metavar="FAMILY",
+        help="Only print the canonical STL for a family directory, e.g. vendor/konik/batman.",
+    )
+    parser.add_argument(
+        "--write-make",
+        type=Path,
+        metavar="PATH",
+        help=f"Write the canonical picks as Makefile variables (the Makefile includes {CANONICAL_MAKE.relative_to(ROOT)}).",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    paths = sorted(VENDOR_DIR.rglob("*.stl"))
+    files, updated = update_index(paths, args.jobs)
+    clustered = {
+        family: cluster(keys, files, args.tolerance) for family, keys in families(files).items()
+    }
+
+    if args.print_canonical is not None:
+        family = args.print_canonical.rstrip("/")
+        if family not in clustered:
+            print(f"unknown family: {family}", file=sys.stderr)
+            return 2
+        print(canonical(clustered[family], files))
+        return 0
+
+    print(f"indexed={len(files)} updated={updated}")
+    if args.write_make is not None:
+        changed = write_if_changed(args.write_make, make_fragment(clustered, files))
+        print(f"make_fragment={args.write_make} changed={int(changed)}")
+    for family, clusters in sorted(clustered.items()):
+        print(f"family={family} canonical={canonical(clusters, files)}")
+        for members in clusters:
+            pick = representative(members, files)
+            print(
+                f"  cluster area={area(pick, files):.1f}mm2 pick={Path(pick).name} "
+                f"files={' '.join(Path(key).name for key in members)}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
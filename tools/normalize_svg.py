@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+import shapely
+from shapely.geometry import LinearRing
+
+
+SVG_NS = "http://www.w3.org/2000/svg"
+# Well below a printer dot (0.085mm at 300dpi) and the 144ppi raster pixel
+# (0.176mm), so simplified outlines are indistinguishable on paper.
+DEFAULT_TOLERANCE_MM = 0.02
+DEFAULT_DECIMALS = 3
+PATH_TOKEN = re.compile(r"[MLZmlz]|-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+
+
+def parse_rings(d: str) -> list[list[tuple[float, float]]]:
+    """Parse OpenSCAD's absolute ``M x,y L x,y ... z`` path data into rings."""
+    rings: list[list[tuple[float, float]]] = []
+    numbers: list[float] = []
+    current: list[tuple[float, float]] = []
+    for token in PATH_TOKEN.findall(d.replace(",", " ")):
+        if token in "Mm":
+            if current:
+                rings.append(current)
+            current = []
+        elif token in "Zz":
+            if current:
+                rings.append(current)
+            current = []
+        elif token in "Ll":
+            continue
+        else:
+            numbers.append(float(token))
+            if len(numbers) == 2:
+                current.append((numbers[0], numbers[1]))
+                numbers = []
+    if current:
+        rings.append(current)
+    return rings
+
+
+def simplify_ring(points: list[tuple[float, float]], tolerance: float) -> tuple[LinearRing | None, float]:
+    if len(points) < 3:
+        return None, 0.0
+    ring = LinearRing(points)
+    # Zero tolerance only drops collinear and repeated vertices.
+    merged = shapely.simplify(ring, 0.0)
+    simplified = shapely.simplify(merged, tolerance, preserve_topology=True)
+    if simplified.is_empty or len(simplified.coords) < 4:
+        return ring, 0.0
+    return simplified, float(ring.hausdorff_distance(simplified))
+
+
+def format_number(value: float, decimals: int) -> str:
+    text = f"{value:.{decimals}f}".rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+
+def ring_path(ring: LinearRing, decimals: int) -> str:
+    coords = list(ring.coords)[:-1]
+    points = [f"{format_number(x, decimals)},{format_number(y, decimals)}" for x, y in coords]
+    return "M " + points[0] + " L " + " ".join(points[1:]) + " z"
+
+
+def to_mm(value: str) -> float:
+    return float(value.removesuffix("mm"))
+
+
+def normalize(source: Path, output: Path, metadata: Path, tolerance: float, decimals: int) -> dict:
+    ET.register_namespace("", SVG_NS)
+    tree = ET.parse(source)
+    svg = tree.getroot()
+
+    vertices_before = 0
+    vertices_after = 0
+    max_deviation = 0.0
+    for path in svg.iter(f"{{{SVG_NS}}}path"):
+        parts = []
+        for points in parse_rings(path.get("d", "")):
+            vertices_before += len(points)
+            ring, deviation = simplify_ring(points, tolerance)
+            if ring is None:
+                continue
+            vertices_after += len(ring.coords) - 1
+            max_deviation = max(max_deviation, deviation)
+            parts.append(ring_path(ring, decimals))
+        path.set("d", "\n".join(parts))
+
+    # Width/height come straight from OpenSCAD's bounding box, so the sidecar
+    # reports the unsimplified extents that the page layout was tuned against.
+    info = {
+        "width_mm": to_mm(svg.get("width", "0")),
+        "height_mm": to_mm(svg.get("height", "0")),
+        "vertices_before": vertices_before,
+        "vertices_after": vertices_after,
+        "tolerance_mm": tolerance,
+        "max_deviation_mm": round(max_deviation, 6),
+    }
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tree.write(output, encoding="utf-8", xml_declaration=True)
+    metadata.write_text(json.dumps(info, indent=2) + "\n")
+    return info
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Simplify an OpenSCAD projection SVG and write a size sidecar for Typst."
+    )
+    parser.add_argument("input", type=Path, help="Raw SVG written by OpenSCAD.")
+    parser.add_argument("output", type=Path, help="Normalized SVG path.")
+    parser.add_argument(
+        "--metadata",
+        type=Path,
+        help="Sidecar JSON path. Defaults to the output path with a .json suffix.",
+    )
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE_MM)
+    parser.add_argument("--decimals", type=int, default=DEFAULT_DECIMALS)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    metadata = args.metadata or args.output.with_suffix(".json")
+    info = normalize(args.input, args.output, metadata, args.tolerance, args.decimals)
+    print(f"svg={args.output}")
+    print(f"size_mm={info['width_mm']}x{info['height_mm']}")
+    print(f"vertices={info['vertices_before']}->{info['vertices_after']}")
+    print(f"max_deviation_mm={info['max_deviation_mm']}")
+    print(f"bytes={args.input.stat().st_size}->{args.output.stat().st_size}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
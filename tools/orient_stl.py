@@ -1,135 +1,188 @@
 #!/usr/bin/env -S uv run
 
+import os
+
 import trimesh
 import numpy as np
 
-def orient_largest_face_down(input_file, output_file, flip=False):
-    print(f"Loading {input_file}...")
-    mesh = trimesh.load(input_file)
-    
-    # Compute stable poses
-    transforms, probs = trimesh.poses.compute_stable_poses(mesh)
-    
+# Binary STL layout: 80-byte header, uint32 triangle count, then one packed
+# 50-byte record per triangle.
+STL_HEADER_SIZE = 84
+STL_RECORD = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attr", "<u2")])
+
+
+def load_stl(input_file):
+    """Load an STL as an indexed mesh, memory-mapping binary files.
+
+    Triangles are read zero-copy through a structured memmap and shared
+    corners are merged by exact coordinate, so no trimesh processing pass
+    runs over the full mesh.
+    """
+    size = os.path.getsize(input_file)
+    with open(input_file, "rb") as f:
+        header = f.read(STL_HEADER_SIZE)
+    count = int.from_bytes(header[80:84], "little") if len(header) == STL_HEADER_SIZE else -1
+    if count < 0 or size != STL_HEADER_SIZE + count * STL_RECORD.itemsize:
+        # ASCII STL; fall back to trimesh's parser.
+        return trimesh.load(input_file, force="mesh")
+
+    records = np.memmap(input_file, dtype=STL_RECORD, mode="r", offset=STL_HEADER_SIZE, shape=(count,))
+    corners = records["vertices"].reshape(-1, 3)
+    vertices, inverse = np.unique(corners, axis=0, return_inverse=True)
+    faces = inverse.reshape(-1, 3)
+    return trimesh.Trimesh(vertices=vertices.astype(np.float64), faces=faces, process=False)
+
+
+def center_of_mass(mesh):
+    """Center of mass of a closed mesh from signed tetrahedron volumes.
+
+    Falls back to the area-weighted surface centroid for open meshes where
+    the enclosed volume is degenerate.
+    """
+    triangles = mesh.vertices[mesh.faces]
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    volumes = np.einsum("ij,ij->i", a, np.cross(b, c)) / 6.0
+    total = volumes.sum()
+    if abs(total) > 1e-9:
+        return ((a + b + c) / 4.0 * volumes[:, None]).sum(axis=0) / total
+
+    areas = np.linalg.norm(np.cross(b - a, c - a), axis=1) / 2.0
+    return ((a + b + c) / 3.0 * areas[:, None]).sum(axis=0) / areas.sum()
+
+
+def orientation_transform(mesh, flip=False):
+    """Return the 4x4 transform that puts the mesh's largest face down.
+
+    Stable poses only depend on the convex hull and the center of mass, so
+    they are computed on the hull; the full mesh is never transformed here.
+    """
+    hull = mesh.convex_hull
+    transforms, probs = trimesh.poses.compute_stable_poses(hull, center_mass=center_of_mass(mesh))
+
     if len(transforms) == 0:
         print("No stable poses found. Using original orientation.")
-        mesh.export(output_file)
-        return
+        return np.eye(4)
 
-    best_transform = transforms[np.argmax(probs)]
-    
+    transform = transforms[np.argmax(probs)]
     print(f"Applying transformation for most stable pose (prob={np.max(probs):.2f})...")
-    mesh.apply_transform(best_transform)
 
     if flip:
         print("Flipping 180 degrees (user override)...")
         # Rotate 180 around X axis
         flip_matrix = trimesh.transformations.rotation_matrix(np.pi, [1, 0, 0])
-        mesh.apply_transform(flip_matrix)
+        transform = flip_matrix @ transform
 
     # ---------------------------------------------------------
     # Refine Orientation: Landscape (Width > Height)
     # ---------------------------------------------------------
-    # Get XY coordinates of all vertices
-    xy_points = mesh.vertices[:, :2]
-    
     # PCA is sensitive to vertex density and can result in slight rotation for asymmetric meshes.
     # Instead, we use the Minimum Area Rectangle of the 2D Convex Hull.
+    # The 2D hull of the 3D hull's vertices equals the 2D hull of the full mesh.
     from scipy.spatial import ConvexHull
-    
-    # 2D Convex Hull
-    hull = ConvexHull(xy_points)
-    hull_points = xy_points[hull.vertices]
-    
+
+    xy_points = trimesh.transform_points(hull.vertices, transform)[:, :2]
+    hull_2d = ConvexHull(xy_points)
+    hull_points = xy_points[hull_2d.vertices]
+
     # Find geometric minimum area rectangle orientation
     min_area = float('inf')
     best_angle = 0.0
-    
+
     # Iterate over all edges of the hull
     num_hull_points = len(hull_points)
     for i in range(num_hull_points):
         p1 = hull_points[i]
         p2 = hull_points[(i + 1) % num_hull_points]
-        
+
         edge = p2 - p1
         # Angle of this edge relative to X-axis
         angle = np.arctan2(edge[1], edge[0])
-        
+
         # Rotate hull points to alignment with X-axis to test AABB area
         c, s = np.cos(-angle), np.sin(-angle)
         # 2D Rotation matrix
         R = np.array([[c, -s], [s, c]])
-        
+
         rotated_hull = hull_points @ R.T
-        
+
         min_x = np.min(rotated_hull[:, 0])
         max_x = np.max(rotated_hull[:, 0])
         min_y = np.min(rotated_hull[:, 1])
         max_y = np.max(rotated_hull[:, 1])
-        
+
         area = (max_x - min_x) * (max_y - min_y)
-        
+
         if area < min_area:
             min_area = area
             best_angle = angle
 
     print(f"Aligning to Minimum Area Rectangle (Angle: {np.degrees(best_angle):.2f})...")
-    # Rotate the actual mesh
     rotation_matrix = trimesh.transformations.rotation_matrix(-best_angle, [0, 0, 1])
-    mesh.apply_transform(rotation_matrix)
-    
+    transform = rotation_matrix @ transform
+
     # Ensure Landscape (Width > Height)
-    extents = mesh.extents
+    hull_vertices = trimesh.transform_points(hull.vertices, transform)
+    extents = hull_vertices.max(axis=0) - hull_vertices.min(axis=0)
     if extents[1] > extents[0]: # Y > X
         print("Y extent > X extent. Rotating 90 degrees to enforce Landscape...")
         rot_90 = trimesh.transformations.rotation_matrix(np.pi/2, [0, 0, 1])
-        mesh.apply_transform(rot_90)
-    
+        transform = rot_90 @ transform
+
     # ---------------------------------------------------------
     # Refine Orientation: "Widest Side At Top"
     # ---------------------------------------------------------
     # Heuristic: Check width at Y_max vs Y_min.
     # We want Width(Y_max) > Width(Y_min).
-    
-    # Re-fetch vertices after rotation
-    xy_points = mesh.vertices[:, :2]
+    # This looks at every vertex in the top/bottom slices, so it uses the
+    # full vertex array (points only, no mesh processing).
+    xy_points = trimesh.transform_points(mesh.vertices, transform)[:, :2]
     y_vals = xy_points[:, 1]
     x_vals = xy_points[:, 0]
-    
+
     min_y, max_y = np.min(y_vals), np.max(y_vals)
     tolerance = (max_y - min_y) * 0.1 # Look at top/bottom 10% slices
-    
+
     # Get points in top slice
     top_mask = y_vals > (max_y - tolerance)
     if np.any(top_mask):
         top_width = np.max(x_vals[top_mask]) - np.min(x_vals[top_mask])
     else:
         top_width = 0
-        
+
     # Get points in bottom slice
     bottom_mask = y_vals < (min_y + tolerance)
     if np.any(bottom_mask):
         bottom_width = np.max(x_vals[bottom_mask]) - np.min(x_vals[bottom_mask])
     else:
         bottom_width = 0
-        
+
     print(f"Top Width: {top_width:.2f}, Bottom Width: {bottom_width:.2f}")
-    
+
     if bottom_width > top_width:
         print("Bottom is wider than top. Rotating 180 degrees to put widest side at top...")
         rot_180 = trimesh.transformations.rotation_matrix(np.pi, [0, 0, 1])
-        mesh.apply_transform(rot_180)
-    
+        transform = rot_180 @ transform
+
     # ---------------------------------------------------------
     # Z-Level Adjustment
     # ---------------------------------------------------------
-    bounds = mesh.bounds
-    min_z = bounds[0][2]
-    
+    min_z = trimesh.transform_points(hull.vertices, transform)[:, 2].min()
+
     print(f"Min Z after transform: {min_z}")
-    
+
     if not np.isclose(min_z, 0):
-        mesh.apply_translation([0, 0, -min_z])
-    
+        transform = trimesh.transformations.translation_matrix([0, 0, -min_z]) @ transform
+
+    return transform
+
+
+def orient_largest_face_down(input_file, output_file, flip=False):
+    print(f"Loading {input_file}...")
+    mesh = load_stl(input_file)
+
+    transform = orientation_transform(mesh, flip=flip)
+    mesh.apply_transform(transform)
+
     print(f"Saving to {output_file}...")
     mesh.export(output_file)
 
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import build_mega_templates
+
+
+ROOT = build_mega_templates.ROOT
+BUILD_DIR = build_mega_templates.BUILD_DIR
+# Published next to the full-size outputs, since Pages serves build/ as is.
+WEB_DIR = BUILD_DIR / "web"
+SITE_MANIFEST = WEB_DIR / "site.json"
+SITE_MANIFEST_VERSION = 1
+THUMBNAIL_WIDTH = 320
+# WebP at this quality keeps thin grid and dimension lines legible.
+WEBP_QUALITY = 80
+
+
+@dataclass(frozen=True)
+class PublishTask:
+    pdf: Path
+    png: Path
+    web_pdf: Path
+    thumbnail: Path
+    qpdf: str | None
+    width: int
+
+
+def is_fresh(output: Path, source: Path) -> bool:
+    # Split outputs are only rewritten when their bytes change, so mtimes
+    # reliably say whether a derived file is stale.
+    return output.exists() and output.stat().st_mtime >= source.stat().st_mtime
+
+
+def linearize(qpdf: str, source: Path, output: Path) -> None:
+    """Write a linearized ("fast web view") copy so browsers can show page one early."""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    temporary = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+    # qpdf exits 3 for warnings, which still produce a valid file.
+    completed = subprocess.run(
+        [qpdf, "--linearize", "--object-streams=generate", str(source), str(temporary)],
+        capture_output=True,
+        text=True,
+    )
+    if completed.returncode not in (0, 3):
+        temporary.unlink(missing_ok=True)
+        raise RuntimeError(f"qpdf failed for {source}: {completed.stderr.strip()}")
+    os.replace(temporary, output)
+
+
+def write_thumbnail(source: Path, output: Path, width: int) -> None:
+    from PIL import Image
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    temporary = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+    with Image.open(source) as image:
+        height = round(image.height * width / image.width)
+        thumbnail = image.convert("RGB").resize((width, height), Image.Resampling.LANCZOS)
+    if output.suffix == ".webp":
+        thumbnail.save(temporary, format="WEBP", quality=WEBP_QUALITY, method=6)
+    else:
+        thumbnail.save(temporary, format="PNG", optimize=True)
+    os.replace(temporary, output)
+
+
+def publish_page(task: PublishTask) -> tuple[bool, bool]:
+    """Refresh one page's web PDF and thumbnail; returns which were rewritten."""
+    linearized = False
+    if task.qpdf is not None and not is_fresh(task.web_pdf, task.pdf):
+        linearize(task.qpdf, task.pdf, task.web_pdf)
+        linearized = True
+    thumbnailed = False
+    if not is_fresh(task.thumbnail, task.png):
+        write_thumbnail(task.png, task.thumbnail, task.width)
+        thumbnailed = True
+    return linearized, thumbnailed
+
+
+def site_path(path: Path) -> str:
+    return str(path.relative_to(BUILD_DIR))
+
+
+def file_entry(path: Path) -> dict:
+    data = path.read_bytes()
+    return {"path": site_path(path), "bytes": len(data), "sha256": hashlib.sha256(data).hexdigest()}
+
+
+def unquote(value: str) -> str:
+    return json.loads(value)
+
+
+def millimetres(value: str) -> float:
+    return float(value.removesuffix("mm"))
+
+
+def template_entry(group: str, render: build_mega_templates.Render, task: PublishTask) -> dict:
+    """Describe one page for the site from the arguments of its render."""
+    args = render.args
+    entry: dict = {
+        "group": group,
+        "paper": group.split("-")[1],
+        "mount": Path(unquote(args["svg-file"])).stem.removesuffix("_mount"),
+        "name": unquote(args["mount-name"]),
+        "offsets_mm": [millimetres(args["clearance-offset"])],
+    }
+    if "secondary-clearance-offset" in args:
+        entry["offsets_mm"].append(millimetres(args["secondary-clearance-offset"]))
+    if "custom-clearance-svg" in args:
+        entry["vehicle"] = Path(unquote(args["custom-clearance-svg"])).parts[2]
+    entry["pdf"] = file_entry(render.pdf)
+    if task.web_pdf.exists():
+        entry["web_pdf"] = file_entry(task.web_pdf)
+    entry["png"] = file_entry(render.png)
+    entry["thumbnail"] = file_entry(task.thumbnail)
+    return entry
+
+
+def publish_tasks(
+    groups: list[str], qpdf: str | None, width: int, thumbnail_format: str
+) -> list[tuple[str, build_mega_templates.Render, PublishTask]]:
+    tasks = []
+    for group in groups:
+        for render in build_mega_templates.iter_group_renders(group, git_args={}):
+            for path in (render.pdf, render.png):
+                if not path.exists():
+                    raise RuntimeError(f"missing rendered page: {path}")
+            relative = render.pdf.relative_to(BUILD_DIR)
+            task = PublishTask(
+                pdf=render.pdf,
+                png=render.png,
+                web_pdf=WEB_DIR / relative,
+                thumbnail=WEB_DIR / "thumbs" / relative.with_suffix(f".{thumbnail_format}"),
+                qpdf=qpdf,
+                width=width,
+            )
+            tasks.append((group, render, task))
+    return tasks
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Write linearized PDFs, thumbnails and a site manifest for the published templates."
+    )
+    parser.add_argument(
+        "--group",
+        dest="groups",
+        action="append",
+        choices=build_mega_templates.GROUPS,
+        help="Render group to publish. May be repeated; defaults to all.",
+    )
+    parser.add_argument("--qpdf", default="qpdf")
+    parser.add_argument("--thumbnail-width", type=int, default=THUMBNAIL_WIDTH)
+    parser.add_argument("--thumbnail-format", choices=("webp", "png"), default="webp")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    qpdf = shutil.which(args.qpdf)
+    if qpdf is None:
+        print(f"warning: {args.qpdf} not found; skipping linearized PDFs", file=sys.stderr)
+    groups = args.groups or list(build_mega_templates.GROUPS)
+    tasks = publish_tasks(groups, qpdf, args.thumbnail_width, args.thumbnail_format)
+
+    linearized = thumbnailed = 0
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for pdf_written, thumbnail_written in pool.map(
+            publish_page, [task for _group, _render, task in tasks], chunksize=8
+        ):
+            linearized += pdf_written
+            thumbnailed += thumbnail_written
+
+    entries = [template_entry(group, render, task) for group, render, task in tasks]
+    build_mega_templates.write_if_changed(
+        SITE_MANIFEST,
+        json.dumps({"version": SITE_MANIFEST_VERSION, "templates": entries}, separators=(",", ":")) + "\n",
+    )
+    pdf_bytes = sum(entry["pdf"]["bytes"] for entry in entries)
+    png_bytes = sum(entry["png"]["bytes"] for entry in entries)
+    thumbnail_bytes = sum(entry["thumbnail"]["bytes"] for entry in entries)
+    print(f"pages={len(entries)} linearized={linearized} thumbnails={thumbnailed}")
+    print(f"pdf_bytes={pdf_bytes} png_bytes={png_bytes} thumbnail_bytes={thumbnail_bytes}")
+    print(f"manifest={SITE_MANIFEST.relative_to(ROOT)} bytes={SITE_MANIFEST.stat().st_size}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import trimesh
+from PIL import Image
+
+
+# OpenSCAD's default view of a part: from the front right, 35 degrees above
+# the build plate.
+VIEW_AZIMUTH_DEG = 25.0
+VIEW_ELEVATION_DEG = 35.0
+# Light direction in view space (x right, y up, z towards the viewer).
+LIGHT = np.array((-0.3, 0.5, 1.0)) / np.linalg.norm((-0.3, 0.5, 1.0))
+AMBIENT = 0.35
+# OpenSCAD's "Cornfield" colour scheme.
+BACKGROUND = (255, 255, 229)
+FACE_COLOR = np.array((249, 215, 44), dtype=np.float64)
+MARGIN = 0.05
+# Fragments rasterized per batch; bounds memory for large meshes.
+FRAGMENT_BATCH = 4_000_000
+
+
+def view_basis(azimuth_deg: float, elevation_deg: float) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return (right, up, towards_viewer) unit vectors for an orbit camera around +z."""
+    azimuth, elevation = np.radians(azimuth_deg), np.radians(elevation_deg)
+    towards = np.array(
+        (np.sin(azimuth) * np.cos(elevation), -np.cos(azimuth) * np.cos(elevation), np.sin(elevation))
+    )
+    right = np.cross((0.0, 0.0, 1.0), towards)
+    right /= np.linalg.norm(right)
+    return right, np.cross(towards, right), towards
+
+
+def project(mesh: trimesh.Trimesh, size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return front-facing triangles in pixel space and their flat shade.
+
+    Pixel x grows right, y grows down and z grows towards the viewer; the
+    mesh is centred and scaled to fill the image like OpenSCAD's --viewall.
+    """
+    right, up, towards = view_basis(VIEW_AZIMUTH_DEG, VIEW_ELEVATION_DEG)
+    view = np.column_stack((right, up, towards))
+    normals = mesh.face_normals @ view
+    front = normals[:, 2] > 1e-9
+    vertices = mesh.vertices @ view
+
+    low, high = vertices[:, :2].min(axis=0), vertices[:, :2].max(axis=0)
+    scale = size * (1 - 2 * MARGIN) / max(float((high - low).max()), 1e-9)
+    center = (low + high) / 2
+    pixels = np.column_stack(
+        (
+            (vertices[:, 0] - center[0]) * scale + size / 2,
+            size / 2 - (vertices[:, 1] - center[1]) * scale,
+            vertices[:, 2] * scale,
+        )
+    )
+    shade = AMBIENT + (1 - AMBIENT) * np.clip(normals[front] @ LIGHT, 0.0, 1.0)
+    return pixels[mesh.faces[front]], shade
+
+
+def fragments(
+    triangles: np.ndarray, size: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Scan-convert triangles to (triangle index, pixel index, depth) arrays.
+
+    Each triangle is split into the pixel rows whose centres it covers and
+    each row into its covered pixel centres. Edge crossings are computed
+    with the endpoints ordered by y, so triangles sharing an edge split its
+    pixels exactly.
+    """
+    y = triangles[:, :, 1]
+    first_row = np.clip(np.ceil(y.min(axis=1) - 0.5), 0, size).astype(np.int64)
+    end_row = np.clip(np.ceil(y.max(axis=1) - 0.5), 0, size).astype(np.int64)
+    rows_per_triangle = np.maximum(end_row - first_row, 0)
+    triangle = np.repeat(np.arange(len(triangles)), rows_per_triangle)
+    offsets = np.arange(len(triangle)) - np.repeat(np.cumsum(rows_per_triangle) - rows_per_triangle, rows_per_triangle)
+    row = first_row[triangle] + offsets
+    center_y = row + 0.5
+
+    left = np.full(len(row), np.inf)
+    right = np.full(len(row), -np.inf)
+    for start, end in ((0, 1), (1, 2), (2, 0)):
+        a, b = triangles[triangle, start], triangles[triangle, end]
+        swap = a[:, 1] > b[:, 1]
+        a, b = np.where(swap[:, None], b, a), np.where(swap[:, None], a, b)
+        crosses = (a[:, 1] <= center_y) & (center_y <= b[:, 1]) & (a[:, 1] < b[:, 1])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = a[:, 0] + (center_y - a[:, 1]) * (b[:, 0] - a[:, 0]) / (b[:, 1] - a[:, 1])
+        left = np.where(crosses, np.minimum(left, x), left)
+        right = np.where(crosses, np.maximum(right, x), right)
+
+    valid = np.isfinite(left) & np.isfinite(right)
+    first_column = np.zeros(len(row), np.int64)
+    end_column = np.zeros(len(row), np.int64)
+    first_column[valid] = np.clip(np.ceil(left[valid] - 0.5), 0, size)
+    end_column[valid] = np.clip(np.ceil(right[valid] - 0.5), 0, size)
+    columns_per_row = np.maximum(end_column - first_column, 0)
+
+    triangle = np.repeat(triangle, columns_per_row)
+    offsets = np.arange(len(triangle)) - np.repeat(np.cumsum(columns_per_row) - columns_per_row, columns_per_row)
+    column = np.repeat(first_column, columns_per_row) + offsets
+    row = np.repeat(row, columns_per_row)
+
+    # Depth from the triangle's plane through its first vertex.
+    corners = triangles[triangle]
+    normal = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    depth = corners[:, 0, 2] - (
+        normal[:, 0] * (column + 0.5 - corners[:, 0, 0]) + normal[:, 1] * (row + 0.5 - corners[:, 0, 1])
+    ) / normal[:, 2]
+    return triangle, row * size + column, depth
+
+
+def batches(triangles: np.ndarray, size: int) -> list[slice]:
+    """Split triangles so each batch covers about FRAGMENT_BATCH bounding-box pixels."""
+    extent = triangles[:, :, :2].max(axis=1) - triangles[:, :, :2].min(axis=1)
+    area = np.clip(extent[:, 0] + 1, 1, size) * np.clip(extent[:, 1] + 1, 1, size)
+    bounds = np.searchsorted(np.cumsum(area), np.arange(FRAGMENT_BATCH, area.sum(), FRAGMENT_BATCH))
+    edges = [0, *np.unique(bounds).tolist(), len(triangles)]
+    return [slice(start, end) for start, end in zip(edges, edges[1:]) if end > start]
+
+
+def render(mesh: trimesh.Trimesh, size: int, supersample: int) -> Image.Image:
+    """Rasterize `mesh` with an orthographic camera, a z-buffer and flat shading."""
+    full = size * supersample
+    triangles, shade = project(mesh, full)
+    # The z-buffer keeps the largest depth, i.e. the surface nearest the viewer.
+    depth_buffer = np.full(full * full, -np.inf)
+    shade_buffer = np.zeros(full * full)
+    for batch in batches(triangles, full):
+        triangle, pixel, depth = fragments(triangles[batch], full)
+        np.maximum.at(depth_buffer, pixel, depth)
+        nearest = depth >= depth_buffer[pixel]
+        shade_buffer[pixel[nearest]] = shade[batch][triangle[nearest]]
+
+    covered = np.isfinite(depth_buffer)
+    image = np.empty((full * full, 3), np.uint8)
+    image[:] = BACKGROUND
+    image[covered] = np.round(FACE_COLOR * shade_buffer[covered, None]).astype(np.uint8)
+    result = Image.fromarray(image.reshape(full, full, 3))
+    return result.reduce(supersample) if supersample > 1 else result
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Render a headless, OpenSCAD-style preview PNG of an STL in NumPy."
+    )
+    parser.add_argument("stl", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--size", type=int, default=1024, help="Output width and height in pixels.")
+    parser.add_argument(
+        "--supersample",
+        type=int,
+        default=2,
+        help="Render at this multiple of --size and downsample, for smooth edges.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.size < 1 or args.supersample < 1:
+        print("--size and --supersample must be at least 1", file=sys.stderr)
+        return 2
+    start = time.perf_counter()
+    mesh = trimesh.load(args.stl, force="mesh")
+    image = render(mesh, args.size, args.supersample)
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    image.save(args.output)
+    print(f"preview={args.output} triangles={len(mesh.faces)} seconds={time.perf_counter() - start:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
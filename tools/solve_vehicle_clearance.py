@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import shapely
+from shapely import affinity
+from shapely.geometry import Polygon
+
+import build_mega_templates
+from normalize_svg import parse_rings
+
+
+ROOT = build_mega_templates.ROOT
+BUILD_DIR = build_mega_templates.BUILD_DIR
+CLEARANCE_TABLE = build_mega_templates.VEHICLE_CLEARANCE_TABLE
+# Stop bisecting once the bracket is this narrow.
+PRECISION_MM = 0.01
+# Each vehicle trace gets its own slot along x in the shared STRtree, far
+# enough apart that a mount can never come within range of a neighbour.
+SLOT_SPACING_MM = 10_000.0
+
+
+def trace_polygon(path: Path) -> Polygon:
+    """Load a refined housing trace with its lowest point on y=0 (y grows down).
+
+    Accepts gen/trace.svg or gen/offsets.svg, whose first path is the trace.
+    """
+    match = re.search(r'd="([^"]+)"', path.read_text())
+    if match is None:
+        raise ValueError(f"no path data in {path}")
+    rings = parse_rings(match.group(1))
+    polygon = shapely.make_valid(Polygon(max(rings, key=len)))
+    _min_x, _min_y, _max_x, max_y = polygon.bounds
+    return affinity.translate(polygon, 0, -max_y)
+
+
+def mount_polygon(path: Path):
+    """Load a mount footprint with its top edge centred on (0, 0)."""
+    paths = re.findall(r'\sd="([^"]+)"', path.read_text())
+    rings = [ring for d in paths for ring in parse_rings(d) if len(ring) >= 3]
+    if not rings:
+        raise ValueError(f"no footprint rings in {path}")
+    # Holes do not matter for clearance, so fill every ring.
+    footprint = shapely.union_all([shapely.make_valid(Polygon(ring)) for ring in rings])
+    min_x, min_y, max_x, _max_y = footprint.bounds
+    return affinity.translate(footprint, -(min_x + max_x) / 2, -min_y)
+
+
+def translate_all(geometries: np.ndarray, dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+    """Translate each geometry by its own offset in one vectorised call."""
+    counts = shapely.get_num_coordinates(geometries)
+    shift = np.column_stack((np.repeat(dx, counts), np.repeat(dy, counts)))
+    return shapely.transform(geometries, lambda coords: coords + shift)
+
+
+def solve(
+    traces: dict[str, Polygon],
+    mounts: dict[str, object],
+    clearances: dict[str, float],
+) -> dict[str, dict[str, dict[str, float]]]:
+    """Find the smallest offset at which every mount clears every trace.
+
+    The offset is the gap between the trace's lowest point and the mount's
+    top edge, as laid out by template.typ. The true clearance is never less
+    than the offset, so the answer lies in [0, required clearance] and is
+    bisected for all vehicle x mount pairs at once.
+    """
+    vehicles = sorted(traces)
+    slots = np.arange(len(vehicles), dtype=float) * SLOT_SPACING_MM
+    tree = shapely.STRtree(
+        [affinity.translate(traces[vehicle], slot, 0) for vehicle, slot in zip(vehicles, slots)]
+    )
+
+    pairs = [(v, m) for v in range(len(vehicles)) for m in sorted(mounts)]
+    shapes = np.array([mounts[mount] for _vehicle, mount in pairs], dtype=object)
+    pair_slots = np.array([slots[vehicle] for vehicle, _mount in pairs])
+    required = np.array([clearances[mount] for _vehicle, mount in pairs])
+    own = np.array([vehicle for vehicle, _mount in pairs])
+
+    low = np.zeros(len(pairs))
+    high = required.copy()
+    while len(pairs) and np.max(high - low) > PRECISION_MM:
+        middle = (low + high) / 2
+        placed = translate_all(shapes, pair_slots, middle)
+        too_close = np.zeros(len(pairs), dtype=bool)
+        # Largest clearance bounds the query; each pair is then held to its own.
+        hits = tree.query(placed, predicate="dwithin", distance=float(required.max()))
+        for pair, vehicle in zip(*hits, strict=True):
+            if vehicle == own[pair]:
+                too_close[pair] = True
+        if too_close.any():
+            distances = shapely.distance(placed[too_close], tree.geometries[own[too_close]])
+            too_close[too_close] = distances < required[too_close]
+        low = np.where(too_close, middle, low)
+        high = np.where(too_close, high, middle)
+
+    final = translate_all(shapes, pair_slots, high)
+    gaps = shapely.distance(final, tree.geometries[own])
+    table: dict[str, dict[str, dict[str, float]]] = {}
+    for index, (vehicle, mount) in enumerate(pairs):
+        table.setdefault(vehicles[vehicle], {})[mount] = {
+            "offset_mm": math.ceil(high[index] - 1e-9),
+            "solved_mm": round(float(high[index]), 3),
+            "clearance_mm": round(float(gaps[index]), 3),
+        }
+    return table
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Solve the minimum clearance offset for every vehicle trace and mount footprint."
+    )
+    parser.add_argument(
+        "--clearance",
+        action="append",
+        default=[],
+        metavar="MOUNT=MM",
+        help="Required clearance for a mount. Defaults to the manual VEHICLE_MOUNTS offsets.",
+    )
+    parser.add_argument("--output", type=Path, default=CLEARANCE_TABLE)
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    clearances = {mount: float(offset) for mount, _label, offset in build_mega_templates.VEHICLE_MOUNTS}
+    for item in args.clearance:
+        mount, _, value = item.partition("=")
+        clearances[mount] = float(value)
+
+    traces = {}
+    for vehicle in build_mega_templates.vehicle_dirs():
+        trace = ROOT / "vehicles" / vehicle / "gen" / "offsets.svg"
+        if not trace.exists():
+            print(f"warning: skipping {vehicle}; {trace.relative_to(ROOT)} is not built", file=sys.stderr)
+            continue
+        traces[vehicle] = trace_polygon(trace)
+
+    mounts = {}
+    for mount in clearances:
+        svg = BUILD_DIR / f"{mount}_mount.svg"
+        if not svg.exists():
+            print(f"missing={svg.relative_to(ROOT)}", file=sys.stderr)
+            return 2
+        mounts[mount] = mount_polygon(svg)
+
+    started = time.perf_counter()
+    table = solve(traces, mounts, clearances)
+    elapsed = time.perf_counter() - started
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(
+        json.dumps({"required_clearance_mm": clearances, "vehicles": table}, indent=2, sort_keys=True) + "\n"
+    )
+    for vehicle, row in sorted(table.items()):
+        for mount, result in sorted(row.items()):
+            print(
+                f"vehicle={vehicle} mount={mount} offset_mm={result['offset_mm']} "
+                f"solved_mm={result['solved_mm']} clearance_mm={result['clearance_mm']}"
+            )
+    print(f"pairs={len(traces) * len(mounts)} seconds={elapsed:.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+import build_mega_templates
+from benchmark_geometry import Case, scaling_exponent, synthetic_outline
+
+ROOT = build_mega_templates.ROOT
+sys.path.insert(0, str(ROOT / "tools" / "vehicle_specific"))
+
+import generate_offsets  # noqa: E402
+import refine_trace  # noqa: E402
+
+
+RESULTS_PATH = ROOT / "build" / "stress_catalogue.json"
+DEFAULT_VEHICLE_COUNTS = (10, 50, 200)
+# Copied into the scratch tree; everything else there is generated.
+TREE_FILES = ("Makefile", "template.typ", "vendor/canonical.mk")
+TREE_DIRS = ("tools", "fonts", "img")
+VEHICLE_TEMPLATE = """#import "/template.typ": template
+
+#template(
+  mount-name: "comma four ({name})",
+  svg-file: "/build/c4_mount.svg",
+  clearance-offset: 44mm,
+
+  // Custom Traced Clearance
+  custom-clearance-svg: "/vehicles/{vehicle}/gen/offsets.svg",
+
+  repo-url: "https://github.com/ophwug/mount-install-templates",
+  commit-hash: "Custom",
+  commit-date: "2026-01-26",
+  revision: "1",
+)
+"""
+PLACEHOLDER_MOUNT_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="60mm" height="30mm" viewBox="0 0 60 30">'
+    '<path d="M 0,0 L 60,0 L 60,30 L 0,30 Z" fill="lightgray" stroke="black" stroke-width="0.2"/>'
+    "</svg>\n"
+)
+
+# Runs one stage and reports "seconds maxrss exitcode" on stdout. ru_maxrss
+# survives exec, so a child forked straight from this (large) process would
+# report our own footprint; forking from this small wrapper avoids that.
+RUSAGE_WRAPPER = """
+import os, sys, time
+start = time.perf_counter()
+pid = os.posix_spawnp(
+    sys.argv[1],
+    sys.argv[1:],
+    os.environ,
+    file_actions=[(os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0)],
+)
+_pid, status, usage = os.wait4(pid, 0)
+print(time.perf_counter() - start, usage.ru_maxrss, os.waitstatus_to_exitcode(status))
+"""
+
+
+@dataclass(frozen=True)
+class StageResult:
+    seconds: float
+    peak_rss_bytes: int
+
+
+def write_offsets(path: Path, seed: int) -> None:
+    """Write a perturbed offsets.svg the way the trace workflow would."""
+    rng = np.random.default_rng(seed)
+    outline = synthetic_outline(400, seed) * rng.uniform(0.8, 1.2, size=2)
+    trace = refine_trace.symmetrize_trace(outline)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    generate_offsets.write_svg_offsets([tuple(point) for point in trace], [], str(path))
+
+
+def make_tree(scratch: Path, vehicles: int) -> list[str]:
+    """Populate `scratch` with the build inputs and `vehicles` synthetic vehicles.
+
+    Returns the mount SVGs that had to be replaced by placeholders because
+    they are not built in this checkout.
+    """
+    for name in TREE_FILES:
+        (scratch / name).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(ROOT / name, scratch / name)
+    for name in TREE_DIRS:
+        shutil.copytree(ROOT / name, scratch / name, ignore=shutil.ignore_patterns("__pycache__"))
+
+    placeholders = []
+    (scratch / "build").mkdir()
+    for mount, _label, _offset in build_mega_templates.VEHICLE_MOUNTS:
+        for suffix in (".svg", ".json"):
+            source = ROOT / "build" / f"{mount}_mount{suffix}"
+            if source.exists():
+                shutil.copy2(source, scratch / "build" / source.name)
+        svg = scratch / "build" / f"{mount}_mount.svg"
+        if not svg.exists():
+            svg.write_text(PLACEHOLDER_MOUNT_SVG)
+            placeholders.append(svg.name)
+
+    # The real vehicles stay because the variant pages always render them.
+    for seed, vehicle in enumerate(build_mega_templates.vehicle_dirs()):
+        source = ROOT / "vehicles" / vehicle
+        target = scratch / "vehicles" / vehicle
+        target.mkdir(parents=True)
+        for name in ("name.txt", "template.typ"):
+            shutil.copy2(source / name, target / name)
+        offsets = source / "gen" / "offsets.svg"
+        if offsets.exists():
+            (target / "gen").mkdir()
+            shutil.copy2(offsets, target / "gen" / "offsets.svg")
+        else:
+            write_offsets(target / "gen" / "offsets.svg", 1_000 + seed)
+
+    for index in range(vehicles):
+        vehicle = f"synthetic_{index:04d}"
+        target = scratch / "vehicles" / vehicle
+        target.mkdir(parents=True)
+        name = f"Synthetic Vehicle {index}"
+        (target / "name.txt").write_text(name + "\n")
+        (target / "template.typ").write_text(VEHICLE_TEMPLATE.format(name=name, vehicle=vehicle))
+        write_offsets(target / "gen" / "offsets.svg", index)
+    return placeholders
+
+
+def run_stage(cmd: list[str], cwd: Path) -> StageResult:
+    """Run one stage as its own process and return its wall time and peak RSS."""
+    env = {key: value for key, value in os.environ.items() if key not in ("MAKEFLAGS", "MFLAGS")}
+    completed = subprocess.run(
+        [sys.executable, "-c", RUSAGE_WRAPPER, *cmd],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds, maxrss, returncode = completed.stdout.split()
+    if int(returncode) != 0:
+        raise subprocess.CalledProcessError(int(returncode), cmd, stderr=completed.stderr)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return StageResult(float(seconds), int(maxrss) * scale)
+
+
+def python_stage(code: str) -> list[str]:
+    return [sys.executable, "-c", f"import sys; sys.path.insert(0, 'tools')\n{code}"]
+
+
+def stages(group: str, typst: str | None, ppi: int) -> list[tuple[str, list[str]]]:
+    stem = build_mega_templates.group_stem(group)
+    typ = f"build/mega/{stem}.typ"
+    pdf = f"build/mega/{stem}.pdf"
+    planned = [
+        (
+            "plan",
+            [
+                sys.executable,
+                "tools/build_mega_templates.py",
+                *(arg for name in build_mega_templates.GROUPS for arg in ("--group", name)),
+                "--plan-make",
+                "build/plan.mk",
+                "--plan-json",
+                "build/plan.json",
+            ],
+        ),
+        ("make_parse", ["make", "-s", "--eval", ".stress-parse: ; @:", ".stress-parse"]),
+        (
+            "write_typst",
+            python_stage(
+                "import build_mega_templates as b\n"
+                f"b.write_typst({stem!r}, b.group_renders({group!r}))"
+            ),
+        ),
+    ]
+    if typst is None:
+        return planned
+    paper = group.split("-")[1]
+    return planned + [
+        (
+            "furniture",
+            python_stage(
+                "import build_mega_templates as b\n"
+                f"b.write_page_furniture([{paper!r}], {typst!r})"
+            ),
+        ),
+        ("typst_pdf", [typst, "compile", typ, pdf, "--root", ".", "--font-path", "fonts"]),
+        (
+            "split_pdf",
+            python_stage(
+                "from pathlib import Path\n"
+                "import build_mega_templates as b\n"
+                f"b.split_pdf(Path({pdf!r}), b.group_renders({group!r}, git_args={{}}), set())"
+            ),
+        ),
+        (
+            "typst_png",
+            [
+                typst,
+                "compile",
+                typ,
+                f"build/mega/{stem}_page-{{p}}.png",
+                "--root",
+                ".",
+                "--font-path",
+                "fonts",
+                "--ppi",
+                str(ppi),
+            ],
+        ),
+    ]
+
+
+def measure_catalogue(vehicles: int, group: str, typst: str | None, ppi: int, keep: bool) -> dict:
+    scratch = Path(tempfile.mkdtemp(prefix=f"stress_{vehicles}_"))
+    try:
+        placeholders = make_tree(scratch, vehicles)
+        subprocess.run(["git", "init", "-q"], cwd=scratch, check=True)
+        results: dict = {"placeholder_mounts": placeholders, "stages": {}}
+        for name, cmd in stages(group, typst, ppi):
+            result = run_stage(cmd, scratch)
+            results["stages"][name] = {"seconds": round(result.seconds, 4), "peak_rss_bytes": result.peak_rss_bytes}
+            print(
+                f"vehicles={vehicles} stage={name} seconds={result.seconds:.3f} "
+                f"peak_rss_mb={result.peak_rss_bytes / 1e6:.1f}",
+                flush=True,
+            )
+        stem = build_mega_templates.group_stem(group)
+        for name, path in (("typ_bytes", f"build/mega/{stem}.typ"), ("pdf_bytes", f"build/mega/{stem}.pdf")):
+            if (scratch / path).exists():
+                results[name] = (scratch / path).stat().st_size
+                print(f"vehicles={vehicles} {name}={results[name]}")
+        results["pages"] = (scratch / f"build/mega/{stem}.typ").read_text().count("#template(")
+        return results
+    finally:
+        if keep:
+            print(f"scratch={scratch}")
+        else:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Measure how the vehicle build stages scale with a synthetic vehicle catalogue."
+    )
+    parser.add_argument(
+        "--vehicles",
+        type=int,
+        action="append",
+        help=f"Synthetic vehicle count to measure. May be repeated; defaults to {DEFAULT_VEHICLE_COUNTS}.",
+    )
+    parser.add_argument(
+        "--group",
+        choices=[group for group in build_mega_templates.GROUPS if group.startswith("vehicle-")],
+        default="vehicle-letter",
+    )
+    parser.add_argument("--typst", default="typst")
+    parser.add_argument("--ppi", type=int, default=144)
+    parser.add_argument("--output", type=Path, default=RESULTS_PATH)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch trees for inspection.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    typst = shutil.which(args.typst)
+    if typst is None:
+        print(f"warning: {args.typst} not found; measuring planning stages only", file=sys.stderr)
+    counts = sorted(set(args.vehicles or DEFAULT_VEHICLE_COUNTS))
+    if counts[0] < 0:
+        print("--vehicles must not be negative", file=sys.stderr)
+        return 2
+
+    catalogues = {}
+    for count in counts:
+        catalogues[count] = measure_catalogue(count, args.group, typst, args.ppi, args.keep)
+
+    curves = {}
+    for stage in catalogues[counts[0]]["stages"]:
+        cases = [
+            Case(
+                catalogue["pages"],
+                catalogue["stages"][stage]["seconds"],
+                catalogue["stages"][stage]["peak_rss_bytes"],
+            )
+            for catalogue in catalogues.values()
+        ]
+        exponent = scaling_exponent(cases)
+        curves[stage] = exponent
+        if exponent is not None:
+            print(f"stage={stage} exponent={exponent:.2f}")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(
+        json.dumps(
+            {"group": args.group, "exponents": curves, "catalogues": {str(k): v for k, v in catalogues.items()}},
+            indent=2,
+        )
+        + "\n"
+    )
+    print(f"results={args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import queue
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import build_mega_templates
+
+
+ROOT = build_mega_templates.ROOT
+BUILD_DIR = build_mega_templates.BUILD_DIR
+SERVE_DIR = BUILD_DIR / "serve"
+CACHE_DIR = SERVE_DIR / "cache"
+FORMATS = {"pdf": "application/pdf", "png": "image/png"}
+PAPERS = tuple(build_mega_templates.PAPER_WIDTHS_MM)
+MOUNTS = {mount: (label, is_konik) for mount, label, is_konik in build_mega_templates.UNIVERSAL_MOUNTS}
+MAX_OFFSET_MM = 300.0
+# Bounds how long a request waits for the warm worker before falling back to
+# a cold `typst compile`.
+WORKER_TIMEOUT_S = 10.0
+ANSI_ESCAPE = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+# `typst watch` status lines, after the "[hh:mm:ss]" prefix.
+COMPILING = re.compile(r"\bcompiling\b")
+COMPILED = re.compile(r"\bcompiled (successfully|with warnings|with errors)\b")
+TEMPLATE_PATH = ROOT / "template.typ"
+
+
+class RequestError(ValueError):
+    pass
+
+
+class DiskCache:
+    """Size-bounded least-recently-used cache of rendered files.
+
+    Recency is the file mtime, so the order survives restarts.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries: OrderedDict[str, int] = OrderedDict()
+        directory.mkdir(parents=True, exist_ok=True)
+        existing = sorted(
+            (path for path in directory.iterdir() if path.is_file() and not path.name.startswith(".")),
+            key=lambda path: path.stat().st_mtime_ns,
+        )
+        for path in existing:
+            self.entries[path.name] = path.stat().st_size
+        self.evict()
+
+    @property
+    def size(self) -> int:
+        return sum(self.entries.values())
+
+    def get(self, name: str) -> bytes | None:
+        with self.lock:
+            if name not in self.entries:
+                return None
+            path = self.directory / name
+            try:
+                data = path.read_bytes()
+            except FileNotFoundError:
+                del self.entries[name]
+                return None
+            self.entries.move_to_end(name)
+        os.utime(path)
+        return data
+
+    def put(self, name: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.directory / name)
+        with self.lock:
+            self.entries[name] = len(data)
+            self.entries.move_to_end(name)
+            self.evict()
+
+    def evict(self) -> None:
+        total = self.size
+        while total > self.max_bytes and len(self.entries) > 1:
+            name, size = self.entries.popitem(last=False)
+            (self.directory / name).unlink(missing_ok=True)
+            total -= size
+
+
+class TypstWorker:
+    """One long-lived `typst watch` process for a single-page document.
+
+    Rewriting the document makes Typst recompile it incrementally, reusing
+    the parsed template, fonts and decoded images from earlier requests.
+    """
+
+    def __init__(self, typst: str, fmt: str, ppi: int) -> None:
+        self.typst = typst
+        self.fmt = fmt
+        self.ppi = ppi
+        self.typ_path = SERVE_DIR / f"worker_{fmt}.typ"
+        self.output = SERVE_DIR / f"worker_{fmt}.{fmt}"
+        self.lock = threading.Lock()
+        self.process: subprocess.Popen[str] | None = None
+        self.status: queue.Queue[tuple[str, str, int]] = queue.Queue()
+        self.body: str | None = None
+        self.sequence = 0
+
+    def command(self) -> list[str]:
+        cmd = [self.typst, "watch", str(self.typ_path), str(self.output), "--root", ".", "--font-path", "fonts"]
+        if self.fmt == "png":
+            cmd.extend(["--ppi", str(self.ppi)])
+        return cmd
+
+    def start(self) -> None:
+        self.status = queue.Queue()
+        self.process = subprocess.Popen(
+            self.command(),
+            cwd=ROOT,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+        )
+        threading.Thread(target=self.read_status, args=(self.process, self.status), daemon=True).start()
+
+    @staticmethod
+    def read_status(process: subprocess.Popen[str], status: queue.Queue[tuple[str, str, int]]) -> None:
+        """Queue (event, line, monotonic_ns) for each compile start and result."""
+        assert process.stderr is not None
+        for line in process.stderr:
+            line = ANSI_ESCAPE.sub("", line).strip()
+            compiled = COMPILED.search(line)
+            if compiled is not None:
+                event = "failed" if compiled.group(1) == "with errors" else "compiled"
+            elif COMPILING.search(line):
+                event = "compiling"
+            else:
+                continue
+            status.put((event, line, time.monotonic_ns()))
+        status.put(("exited", "exited", time.monotonic_ns()))
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.process = None
+        self.body = None
+
+    def render(self, body: str) -> bytes:
+        """Compile `body` and return the output; the caller holds `lock`."""
+        if body == self.body and self.output.exists():
+            return self.output.read_bytes()
+        SERVE_DIR.mkdir(parents=True, exist_ok=True)
+        while not self.status.empty():
+            self.status.get_nowait()
+        self.body = None
+        self.sequence += 1
+        written = self.write_document(body)
+        if self.process is None or self.process.poll() is not None:
+            self.start()
+        self.wait_for_compile(written)
+        self.body = body
+        return self.output.read_bytes()
+
+    def write_document(self, body: str) -> int:
+        """Atomically replace the watched document; returns the write time.
+
+        The trailing sequence comment makes every request a change Typst
+        recompiles, even when it repeats an earlier body.
+        """
+        temporary = self.typ_path.with_name(f".{self.typ_path.name}.tmp")
+        temporary.write_text(f"{document(body)}// request {self.sequence}\n")
+        written = time.monotonic_ns()
+        os.replace(temporary, self.typ_path)
+        return written
+
+    def wait_for_compile(self, written: int) -> None:
+        """Wait for the result of the first compile that started after `written`.
+
+        Results of compiles already running when the document was replaced,
+        such as a late second compile of the previous request, are skipped.
+        """
+        deadline = time.monotonic() + WORKER_TIMEOUT_S
+        started = False
+        while True:
+            try:
+                event, line, seen = self.status.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                self.stop()
+                raise RuntimeError(f"typst watch did not report a compile within {WORKER_TIMEOUT_S}s") from None
+            if event == "exited" or (started and event == "failed"):
+                self.stop()
+                raise RuntimeError(f"typst watch: {line}")
+            if event == "compiling":
+                started = started or seen >= written
+            elif started and event == "compiled":
+                return
+
+
+def document(body: str) -> str:
+    return f'#import "/template.typ": template\n\n{body}\n'
+
+
+def cold_compile(typst: str, body: str, fmt: str, ppi: int) -> bytes:
+    SERVE_DIR.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=SERVE_DIR) as scratch:
+        typ_path = Path(scratch) / "page.typ"
+        output = Path(scratch) / f"page.{fmt}"
+        typ_path.write_text(document(body))
+        cmd = [typst, "compile", str(typ_path), str(output), "--root", ".", "--font-path", "fonts"]
+        if fmt == "png":
+            cmd.extend(["--ppi", str(ppi)])
+        subprocess.run(cmd, cwd=ROOT, check=True, capture_output=True, text=True)
+        return output.read_bytes()
+
+
+def parse_offset(query: dict[str, list[str]], name: str) -> float:
+    try:
+        value = float(query[name][0])
+    except (KeyError, ValueError):
+        raise RequestError(f"{name} must be a number of millimetres") from None
+    if not 0 < value <= MAX_OFFSET_MM:
+        raise RequestError(f"{name} must be in (0, {MAX_OFFSET_MM:g}]")
+    return value
+
+
+def parse_request(path: str) -> tuple[str, str, str, float, float]:
+    """Return (format, paper, mount, primary, secondary) for a /template.<fmt> URL."""
+    url = urlparse(path)
+    match = re.fullmatch(r"/template\.(\w+)", url.path)
+    if match is None or match.group(1) not in FORMATS:
+        raise RequestError("use /template.pdf or /template.png")
+    query = parse_qs(url.query)
+    mount = query.get("mount", [""])[0]
+    if mount not in MOUNTS:
+        raise RequestError(f"mount must be one of {', '.join(MOUNTS)}")
+    paper = query.get("paper", ["letter"])[0]
+    if paper not in PAPERS:
+        raise RequestError(f"paper must be one of {', '.join(PAPERS)}")
+    primary = parse_offset(query, "primary")
+    secondary = parse_offset(query, "secondary")
+    return match.group(1), paper, mount, primary, secondary
+
+
+def file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class TemplateService:
+    def __init__(self, typst: str, ppi: int, cache_bytes: int, warm: bool) -> None:
+        self.typst = typst
+        self.ppi = ppi
+        self.cache = DiskCache(CACHE_DIR, cache_bytes)
+        self.git_args = build_mega_templates.common_git_args()
+        self.workers = {fmt: TypstWorker(typst, fmt, ppi) for fmt in FORMATS} if warm else {}
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        for paper in PAPERS:
+            build_mega_templates.write_clearance_arcs(paper)
+        build_mega_templates.write_page_furniture(PAPERS, typst)
+
+    def cache_name(self, render: build_mega_templates.Render, fmt: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(render.body.encode())
+        # Hashed per request so edits to the template invalidate cached pages.
+        digest.update(file_digest(TEMPLATE_PATH).encode())
+        for dep in render.deps:
+            digest.update(file_digest(dep).encode())
+        if fmt == "png":
+            digest.update(f"ppi={self.ppi}".encode())
+        return f"{digest.hexdigest()}.{fmt}"
+
+    def render(self, fmt: str, paper: str, mount: str, primary: float, secondary: float) -> tuple[bytes, str, bool]:
+        """Return (data, filename, cache hit) for one template page."""
+        label, is_konik = MOUNTS[mount]
+        render = build_mega_templates.universal_render(
+            paper, mount, label, is_konik, primary, secondary, self.git_args
+        )
+        filename = render.pdf.name if fmt == "pdf" else render.png.name
+        missing = [dep for dep in render.deps if not dep.exists()]
+        if missing:
+            raise FileNotFoundError(f"{missing[0].relative_to(ROOT)} is not built; run make {missing[0].relative_to(ROOT)}")
+        name = self.cache_name(render, fmt)
+        data = self.cache.get(name)
+        if data is not None:
+            self.hits += 1
+            return data, filename, True
+
+        worker = self.workers.get(fmt)
+        if worker is None:
+            data = self.compile_cold(render.body, fmt)
+        else:
+            with worker.lock:
+                # Another thread may have rendered the same page meanwhile.
+                data = self.cache.get(name)
+                if data is not None:
+                    self.hits += 1
+                    return data, filename, True
+                try:
+                    data = worker.render(render.body)
+                except (OSError, RuntimeError) as exc:
+                    print(f"warm worker failed, compiling cold: {exc}", file=sys.stderr)
+                    self.fallbacks += 1
+                    data = self.compile_cold(render.body, fmt)
+        self.misses += 1
+        self.cache.put(name, data)
+        return data, filename, False
+
+    def compile_cold(self, body: str, fmt: str) -> bytes:
+        return cold_compile(self.typst, body, fmt, self.ppi)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+            "cache_entries": len(self.cache.entries),
+            "cache_bytes": self.cache.size,
+            "cache_max_bytes": self.cache.max_bytes,
+        }
+
+    def close(self) -> None:
+        for worker in self.workers.values():
+            with worker.lock:
+                worker.stop()
+
+
+class Handler(BaseHTTPRequestHandler):
+    service: TemplateService
+
+    def do_GET(self) -> None:
+        if self.path == "/stats":
+            self.send(HTTPStatus.OK, "application/json", json.dumps(self.service.stats()).encode())
+            return
+        started = time.perf_counter()
+        try:
+            fmt, paper, mount, primary, secondary = parse_request(self.path)
+            data, filename, hit = self.service.render(fmt, paper, mount, primary, secondary)
+        except RequestError as exc:
+            self.send(HTTPStatus.BAD_REQUEST, "text/plain", f"{exc}\n".encode())
+            return
+        except FileNotFoundError as exc:
+            self.send(HTTPStatus.SERVICE_UNAVAILABLE, "text/plain", f"{exc}\n".encode())
+            return
+        except subprocess.CalledProcessError as exc:
+            self.send(HTTPStatus.INTERNAL_SERVER_ERROR, "text/plain", (exc.stderr or str(exc)).encode())
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.send(
+            HTTPStatus.OK,
+            FORMATS[fmt],
+            data,
+            {
+                "Content-Disposition": f'inline; filename="{filename}"',
+                "X-Cache": "hit" if hit else "miss",
+                "X-Render-Ms": f"{elapsed_ms:.1f}",
+            },
+        )
+
+    def send(self, status: HTTPStatus, content_type: str, data: bytes, headers: dict[str, str] | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Serve single universal template pages for arbitrary paired offsets."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--typst", default="typst")
+    parser.add_argument("--ppi", type=int, default=144)
+    parser.add_argument(
+        "--cache-mb",
+        type=float,
+        default=256,
+        help="Size bound for the rendered page cache under build/serve/cache/.",
+    )
+    parser.add_argument(
+        "--cold",
+        action="store_true",
+        help="Run `typst compile` per request instead of keeping warm `typst watch` workers.",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    service = TemplateService(args.typst, args.ppi, int(args.cache_mb * 1024 * 1024), warm=not args.cold)
+    Handler.service = service
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"serving=http://{args.host}:{server.server_port}/template.pdf?mount=c4&primary=47&secondary=77&paper=letter")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+import build_mega_templates
+
+
+ROOT = build_mega_templates.ROOT
+TEMPLATE = ROOT / "template.typ"
+# Section markers in template.typ; each feature runs until the next marker.
+FEATURE_MARKERS = (
+    ("page-grid", "let page-background = "),
+    ("page-setup", "set text("),
+    ("mount", "// 1. Mount"),
+    ("dimensions", "// 2. Dimension Line"),
+    ("clearance", "// 3. Keep Clear Zone Arcs"),
+    ("footer", "#place(bottom + center)"),
+)
+# Single lines that are worth separating from the section around them.
+FEATURE_LINES = (
+    ("centerline-illustration", 'image("img/car_with_centerline.svg"'),
+    ("custom-clearance-svg", "image(custom-clearance-svg)"),
+    ("clearance-arcs-svg", "image(clearance-arcs-svg"),
+    ("clearance-circles", "#circle(radius: r"),
+    ("page-grid-svg", "image(page-grid-svg"),
+    ("qr-code", "instructions-qr"),
+    ("qr-code-svg", "image(qr-code-svg"),
+)
+
+
+@dataclass
+class Span:
+    tid: int
+    start: float
+    end: float
+    file: str | None
+    line: int | None
+    self_time: float = 0.0
+    parent: Span | None = None
+
+
+def load_spans(trace: Path) -> list[Span]:
+    """Read Typst's `--timings` Chrome trace into closed spans (microseconds)."""
+    data = json.loads(trace.read_text())
+    events = data["traceEvents"] if isinstance(data, dict) else data
+    spans: list[Span] = []
+    open_spans: dict[int, list[tuple[dict, float]]] = defaultdict(list)
+    for event in sorted(events, key=lambda event: event.get("ts", 0)):
+        args = event.get("args") or {}
+        tid = event.get("tid", 0)
+        phase = event.get("ph")
+        if phase == "X":
+            start = float(event["ts"])
+            spans.append(Span(tid, start, start + float(event.get("dur", 0)), args.get("file"), args.get("line")))
+        elif phase == "B":
+            open_spans[tid].append((args, float(event["ts"])))
+        elif phase == "E" and open_spans[tid]:
+            begin_args, start = open_spans[tid].pop()
+            spans.append(Span(tid, start, float(event["ts"]), begin_args.get("file"), begin_args.get("line")))
+    nest(spans)
+    return spans
+
+
+def nest(spans: list[Span]) -> None:
+    """Link spans to their enclosing span per thread and compute self time."""
+    by_thread: dict[int, list[Span]] = defaultdict(list)
+    for span in spans:
+        by_thread[span.tid].append(span)
+    for thread_spans in by_thread.values():
+        thread_spans.sort(key=lambda span: (span.start, -span.end))
+        stack: list[Span] = []
+        for span in thread_spans:
+            while stack and stack[-1].end <= span.start:
+                stack.pop()
+            span.self_time = span.end - span.start
+            if stack:
+                span.parent = stack[-1]
+                stack[-1].self_time -= span.end - span.start
+            stack.append(span)
+
+
+def template_features(template: Path = TEMPLATE) -> dict[int, str]:
+    """Map each 1-based template.typ line to a feature name."""
+    lines = template.read_text().splitlines()
+    features: dict[int, str] = {}
+    current = "template-setup"
+    for number, text in enumerate(lines, start=1):
+        for name, marker in FEATURE_MARKERS:
+            if marker in text:
+                current = name
+        features[number] = current
+        for name, marker in FEATURE_LINES:
+            if marker in text:
+                features[number] = name
+    return features
+
+
+def page_lines(typ_path: Path) -> dict[int, int]:
+    """Map the line of each `#template(` call in a mega document to its page."""
+    pages: dict[int, int] = {}
+    for number, text in enumerate(typ_path.read_text().splitlines(), start=1):
+        if text.startswith("#template("):
+            pages[number] = len(pages)
+    return pages
+
+
+def normalized(path: str | None) -> str:
+    return (path or "").replace("\\", "/").lstrip("/")
+
+
+def classify(span: Span, mega_name: str, pages: dict[int, int], features: dict[int, str]) -> tuple[int | None, str]:
+    """Return (page index, feature) for a span from its innermost known ancestors."""
+    page = None
+    feature = None
+    node: Span | None = span
+    while node is not None and (page is None or feature is None):
+        path = normalized(node.file)
+        if feature is None:
+            if path == "template.typ" and node.line in features:
+                feature = features[node.line]
+            elif "cades" in path:
+                feature = "qr-code"
+            elif path.startswith("vehicles/"):
+                feature = "custom-clearance-svg"
+        if page is None and path.endswith(mega_name) and node.line in pages:
+            page = pages[node.line]
+        node = node.parent
+    if feature is None:
+        feature = "page-call" if page is not None else "unattributed"
+    return page, feature
+
+
+def mount_of(render: build_mega_templates.Render) -> str:
+    return Path(json.loads(render.args["svg-file"])).stem.removesuffix("_mount")
+
+
+def paper_of(render: build_mega_templates.Render) -> str:
+    return "a4" if "paper-size" in render.args else "letter"
+
+
+def attribute(trace: Path, typ_path: Path, renders: list[build_mega_templates.Render]) -> dict:
+    spans = load_spans(trace)
+    pages = page_lines(typ_path)
+    features = template_features()
+
+    by_page: dict[int, float] = defaultdict(float)
+    by_feature: dict[str, float] = defaultdict(float)
+    by_mount: dict[str, float] = defaultdict(float)
+    by_paper: dict[str, float] = defaultdict(float)
+    by_mount_feature: dict[str, float] = defaultdict(float)
+    unpaged = 0.0
+    for span in spans:
+        seconds = span.self_time / 1e6
+        page, feature = classify(span, typ_path.name, pages, features)
+        by_feature[feature] += seconds
+        if page is None or page >= len(renders):
+            unpaged += seconds
+            continue
+        render = renders[page]
+        by_page[page] += seconds
+        by_mount[mount_of(render)] += seconds
+        by_paper[paper_of(render)] += seconds
+        by_mount_feature[f"{mount_of(render)}/{feature}"] += seconds
+
+    def ranked(values: dict) -> dict:
+        return {key: round(value, 4) for key, value in sorted(values.items(), key=lambda item: -item[1])}
+
+    total = sum(by_feature.values())
+    return {
+        "total_seconds": round(total, 4),
+        "unpaged_seconds": round(unpaged, 4),
+        "by_feature": ranked(by_feature),
+        "by_mount": ranked(by_mount),
+        "by_paper": ranked(by_paper),
+        "by_mount_feature": ranked(by_mount_feature),
+        "by_page": [
+            {"page": page + 1, "pdf": str(renders[page].pdf.relative_to(ROOT)), "seconds": round(seconds, 4)}
+            for page, seconds in sorted(by_page.items(), key=lambda item: -item[1])
+        ],
+    }
+
+
+def print_report(report: dict, top: int = 5) -> None:
+    total = report["total_seconds"] or 1.0
+    print(f"timed_seconds={report['total_seconds']} unpaged_seconds={report['unpaged_seconds']}")
+    for section, label in (("by_feature", "feature"), ("by_mount", "mount"), ("by_paper", "paper")):
+        for key, seconds in report[section].items():
+            print(f"{label}={key} seconds={seconds} share={100 * seconds / total:.1f}%")
+    for entry in report["by_page"][:top]:
+        print(f"page={entry['page']} pdf={entry['pdf']} seconds={entry['seconds']}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Attribute a mega compile's Typst --timings trace to pages, mounts and template features."
+    )
+    parser.add_argument("--group", choices=build_mega_templates.GROUPS, required=True)
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        help="Timings JSON. Defaults to the group's trace under build/mega/.",
+    )
+    parser.add_argument("--top", type=int, default=5, help="Number of slowest pages to print.")
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    stem = build_mega_templates.group_stem(args.group)
+    trace = args.trace or build_mega_templates.MEGA_DIR / f"{stem}.timings.json"
+    typ_path = build_mega_templates.MEGA_DIR / f"{stem}.typ"
+    if not trace.exists() or not typ_path.exists():
+        print(f"missing {trace} or {typ_path}; build with --timings first", file=sys.stderr)
+        return 2
+    renders = build_mega_templates.group_renders(args.group, git_args={})
+    print_report(attribute(trace, typ_path, renders), args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
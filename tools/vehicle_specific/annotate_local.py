@@ -0,0 +1,237 @@
+import argparse
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from process_annotation import write_trace_svg
+
+# ISO/IEC 7810 ID-1, the size of a credit card.
+CARD_LONG_MM = 85.60
+CARD_SHORT_MM = 53.98
+CARD_ASPECT = CARD_LONG_MM / CARD_SHORT_MM
+CARD_ASPECT_TOLERANCE = 0.06
+# Rounded corners and glare keep a real card's contour from filling its
+# rotated bounding box completely.
+CARD_MIN_FILL = 0.85
+# Segmentation runs on a copy scaled to this many pixels on the long side;
+# GrabCut is far too slow at scanner resolution.
+WORK_SIZE = 800
+GRABCUT_ITERATIONS = 5
+# Same colours process_annotation.py thresholds for (BGR).
+MAGENTA = (255, 0, 255)
+CYAN = (255, 255, 0)
+
+
+def saturated_mask(img):
+    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+    return cv2.inRange(hsv, (0, 70, 50), (180, 255, 255))
+
+
+def find_card(img):
+    """Return the rotated rect ((cx, cy), (w, h), angle) of the ID-1 card, or None.
+
+    Candidates are blobs of saturated colour, closed at a few scales so that
+    white stripes or printing do not split the card, and contours of the
+    closed edge map for cards without much colour.
+    """
+    longest = max(img.shape[:2])
+    opened = cv2.morphologyEx(saturated_mask(img), cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
+    gray = cv2.GaussianBlur(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+    edges = cv2.morphologyEx(cv2.Canny(gray, 30, 100), cv2.MORPH_CLOSE, np.ones((7, 7), np.uint8))
+    masks = [opened]
+    for fraction in (0.01, 0.02, 0.04):
+        size = int(fraction * longest) | 1
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (size, size))
+        masks.append(cv2.morphologyEx(opened, cv2.MORPH_CLOSE, kernel))
+
+    best = None
+    min_area = img.shape[0] * img.shape[1] * 0.005
+    candidates = [cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0] for mask in masks]
+    candidates.append(cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)[0])
+    for contours in candidates:
+        for contour in contours:
+            area = cv2.contourArea(contour)
+            if area < min_area:
+                continue
+            rect = cv2.minAreaRect(contour)
+            width, height = rect[1]
+            aspect = max(width, height) / min(width, height)
+            error = abs(aspect - CARD_ASPECT) / CARD_ASPECT
+            fill = area / (width * height)
+            if error > CARD_ASPECT_TOLERANCE or fill < CARD_MIN_FILL:
+                continue
+            score = fill * (1 - error)
+            if best is None or score > best[0]:
+                best = (score, rect)
+    return best[1] if best else None
+
+
+def segment_cover(img, card):
+    """Return the outer contour (full-resolution pixels) of the cover under the card.
+
+    The card lies on the cover, so a ring just outside it gives the cover's
+    brightness and the image border gives the background's. Those seed
+    GrabCut on a downscaled copy; the component containing the card wins.
+    """
+    scale = WORK_SIZE / max(img.shape[:2])
+    small = cv2.resize(img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    (cx, cy), (width, height), angle = card
+    card_small = ((cx * scale, cy * scale), (width * scale, height * scale), angle)
+    value = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2HSV)[:, :, 2], (0, 0), 1.5)
+
+    card_mask = np.zeros(value.shape, np.uint8)
+    cv2.fillPoly(card_mask, [cv2.boxPoints(card_small).astype(np.int32)], 255)
+    ring_size = int(max(card_small[1]) * 0.15) | 1
+    ring = cv2.dilate(card_mask, np.ones((ring_size, ring_size), np.uint8)) & ~card_mask
+    margin = max(4, int(0.02 * WORK_SIZE))
+    border = np.zeros(value.shape, bool)
+    border[:margin] = border[-margin:] = True
+    border[:, :margin] = border[:, -margin:] = True
+    cover_level = float(np.median(value[ring > 0]))
+    background_level = float(np.median(value[border]))
+    contrast = background_level - cover_level
+    if contrast <= 0:
+        return None
+
+    mask = np.full(value.shape, cv2.GC_PR_BGD, np.uint8)
+    mask[value < cover_level + contrast / 2] = cv2.GC_PR_FGD
+    sure_cover = cv2.erode(np.uint8(value < cover_level + contrast * 0.15) * 255, np.ones((5, 5), np.uint8))
+    mask[sure_cover > 0] = cv2.GC_FGD
+    mask[card_mask > 0] = cv2.GC_FGD
+    mask[border] = cv2.GC_BGD
+    mask[np.abs(value - background_level) < contrast * 0.1] = cv2.GC_BGD
+    background_model = np.zeros((1, 65), np.float64)
+    foreground_model = np.zeros((1, 65), np.float64)
+    cv2.grabCut(
+        small, mask, None, background_model, foreground_model, GRABCUT_ITERATIONS, cv2.GC_INIT_WITH_MASK
+    )
+
+    cover = np.uint8((mask == cv2.GC_FGD) | (mask == cv2.GC_PR_FGD)) * 255
+    cover = cv2.morphologyEx(cover, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
+    _count, labels = cv2.connectedComponents(cover)
+    label = labels[int(card_small[0][1]), int(card_small[0][0])]
+    if label == 0:
+        return None
+    contours, _ = cv2.findContours(np.uint8(labels == label) * 255, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_NONE)
+    contour = max(contours, key=cv2.contourArea).astype(np.float64) / scale
+    return contour.astype(np.int32)
+
+
+def annotate(img, card, contour):
+    """Draw the outlines annotate_scan.py asks the remote model for."""
+    annotated = img.copy()
+    thickness = max(5, round(max(img.shape[:2]) * 0.004))
+    cv2.drawContours(annotated, [contour], -1, MAGENTA, thickness)
+    cv2.drawContours(annotated, [cv2.boxPoints(card).astype(np.int32)], -1, CYAN, thickness)
+    return annotated
+
+
+def trace_points(card, contour):
+    """Convert the cover contour to millimetres, simplified like process_annotation.py."""
+    pixels_per_mm = max(card[1]) / CARD_LONG_MM
+    epsilon = 0.001 * cv2.arcLength(contour, True)
+    approx_curve = cv2.approxPolyDP(contour, epsilon, True)
+    return [(x / pixels_per_mm, y / pixels_per_mm) for x, y in approx_curve[:, 0]], pixels_per_mm
+
+
+def default_output(scan_path, svg):
+    vehicle_dir = os.path.dirname(os.path.dirname(os.path.abspath(scan_path)))
+    if svg:
+        return os.path.join(vehicle_dir, "gen", "raw_trace.svg")
+    return os.path.join(vehicle_dir, "ai", "annotated_scan.png")
+
+
+def annotate_remote(scan_path, output_path, svg):
+    """Fall back to the remote model through annotate_scan.py."""
+    tools_dir = os.path.dirname(os.path.abspath(__file__))
+    annotated_path = default_output(scan_path, False) if svg else output_path
+    os.makedirs(os.path.dirname(annotated_path), exist_ok=True)
+    subprocess.run(
+        [sys.executable, os.path.join(tools_dir, "annotate_scan.py"), scan_path, annotated_path], check=True
+    )
+    if svg:
+        subprocess.run(
+            [sys.executable, os.path.join(tools_dir, "process_annotation.py"), annotated_path, output_path],
+            check=True,
+        )
+
+
+def process_scan(scan_path, output_path, svg, remote_fallback):
+    """Annotate one scan; returns a one-line status for the parent process."""
+    img = cv2.imread(scan_path)
+    if img is None:
+        return f"error={scan_path} reason=unreadable"
+    card = find_card(img)
+    contour = segment_cover(img, card) if card is not None else None
+    if contour is None:
+        reason = "no-card" if card is None else "no-cover"
+        if not remote_fallback:
+            return f"error={scan_path} reason={reason}"
+        annotate_remote(scan_path, output_path, svg)
+        return f"scan={scan_path} output={output_path} annotator=remote reason={reason}"
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    if svg:
+        points_mm, pixels_per_mm = trace_points(card, contour)
+        write_trace_svg(points_mm, img.shape, pixels_per_mm, output_path)
+    else:
+        cv2.imwrite(output_path, annotate(img, card, contour))
+    return f"scan={scan_path} output={output_path} annotator=local pixels_per_mm={max(card[1]) / CARD_LONG_MM:.3f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Annotate vehicle scans locally with OpenCV (card detection and cover segmentation)."
+    )
+    parser.add_argument("scans", nargs="+", help="Raw scans, e.g. vehicles/<vehicle>/raw/scan.png")
+    parser.add_argument(
+        "--output",
+        help="Output path for a single scan. Defaults to <vehicle>/ai/annotated_scan.png "
+        "(or <vehicle>/gen/raw_trace.svg with --svg).",
+    )
+    parser.add_argument(
+        "--svg",
+        action="store_true",
+        help="Write raw_trace.svg directly instead of an annotated image for process_annotation.py.",
+    )
+    parser.add_argument(
+        "--remote-fallback",
+        action="store_true",
+        help="Use annotate_scan.py (Gemini) for scans where the card or cover is not found.",
+    )
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    if args.output and len(args.scans) != 1:
+        print("Error: --output can only be used with one scan")
+        sys.exit(1)
+    missing = [scan for scan in args.scans if not os.path.exists(scan)]
+    if missing:
+        print(f"Error: File not found {missing[0]}")
+        sys.exit(1)
+
+    outputs = [args.output or default_output(scan, args.svg) for scan in args.scans]
+    jobs = max(1, min(args.jobs, len(args.scans)))
+    failed = False
+    # One OpenCV thread per worker; the pool already uses every core.
+    initargs = (1,) if jobs > 1 else (cv2.getNumThreads(),)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=cv2.setNumThreads, initargs=initargs) as pool:
+        for status in pool.map(
+            process_scan,
+            args.scans,
+            outputs,
+            [args.svg] * len(args.scans),
+            [args.remote_fallback] * len(args.scans),
+        ):
+            print(status)
+            failed = failed or status.startswith("error=")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
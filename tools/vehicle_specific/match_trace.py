@@ -0,0 +1,156 @@
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from refine_trace import parse_svg_path_points
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+INDEX_PATH = os.path.join(REPO_ROOT, "build", "vehicle_trace_index.json")
+INDEX_VERSION = 2
+
+# Contours are resampled to this many evenly spaced points before the FFT,
+# so traces with different vertex counts are comparable.
+SAMPLES = 256
+# Low-frequency harmonics carry the overall housing shape; higher ones are
+# mostly annotation noise.
+HARMONICS = 16
+
+
+def resample(points, samples=SAMPLES):
+    closed = np.vstack([points, points[:1]])
+    segment_lengths = np.hypot(*np.diff(closed, axis=0).T)
+    distance = np.concatenate([[0.0], np.cumsum(segment_lengths)])
+    targets = np.linspace(0.0, distance[-1], samples, endpoint=False)
+    x = np.interp(targets, distance, closed[:, 0])
+    y = np.interp(targets, distance, closed[:, 1])
+    return np.column_stack([x, y])
+
+
+def signed_area(points):
+    x, y = points[:, 0], points[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def fourier_descriptor(points):
+    """Translation-, scale-, rotation-, start-point- and winding-invariant descriptor."""
+    # Reversing a contour swaps F(k) and F(-k), so give every contour the same
+    # (positive signed area) winding before the FFT.
+    if signed_area(points) < 0:
+        points = points[::-1]
+    contour = resample(points)
+    coefficients = np.fft.fft(contour[:, 0] + 1j * contour[:, 1])
+    # Dropping F0 removes translation; dividing by the fundamental removes
+    # scale; keeping only magnitudes removes rotation and the starting point.
+    scale = max(np.abs(coefficients[1]), np.abs(coefficients[-1])) or 1.0
+    harmonics = np.concatenate([coefficients[2:HARMONICS + 1], coefficients[-HARMONICS:]])
+    return (np.abs(harmonics) / scale).tolist()
+
+
+def hu_descriptor(points):
+    hu = cv2.HuMoments(cv2.moments(points.astype(np.float32))).ravel()
+    return [float(-np.sign(v) * np.log10(abs(v))) if v else 0.0 for v in hu]
+
+
+def describe(svg_path):
+    points = parse_svg_path_points(svg_path)
+    return {
+        "fourier": fourier_descriptor(points),
+        "hu": hu_descriptor(points),
+    }
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_index():
+    if not os.path.exists(INDEX_PATH):
+        return {}
+    with open(INDEX_PATH) as f:
+        data = json.load(f)
+    if data.get("version") != INDEX_VERSION:
+        return {}
+    return data.get("vehicles", {})
+
+
+def refresh_index():
+    """Describe every vehicle trace, reusing entries whose file is unchanged."""
+    index = load_index()
+    traces = sorted(glob.glob(os.path.join(REPO_ROOT, "vehicles", "*", "gen", "trace.svg")))
+    current = {}
+    changed = False
+    for trace in traces:
+        vehicle = os.path.basename(os.path.dirname(os.path.dirname(trace)))
+        digest = file_sha256(trace)
+        entry = index.get(vehicle)
+        if entry is None or entry["sha256"] != digest:
+            entry = {"sha256": digest, **describe(trace)}
+            changed = True
+        current[vehicle] = entry
+
+    if changed or set(current) != set(index):
+        os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
+        with open(INDEX_PATH, "w") as f:
+            json.dump({"version": INDEX_VERSION, "vehicles": current}, f, indent=2, sort_keys=True)
+            f.write("\n")
+    return current
+
+
+def rank(query, index, top):
+    if not index:
+        return []
+    vehicles = sorted(index)
+    fourier = np.array([index[v]["fourier"] for v in vehicles])
+    hu = np.array([index[v]["hu"] for v in vehicles])
+    # Only the first two Hu invariants are stable for near-symmetric outlines.
+    distances = (
+        np.linalg.norm(fourier - np.array(query["fourier"]), axis=1)
+        + 0.1 * np.abs(hu[:, :2] - np.array(query["hu"][:2])).sum(axis=1)
+    )
+    order = np.argsort(distances)[:top]
+    return [(vehicles[i], float(distances[i]), float(1.0 / (1.0 + distances[i]))) for i in order]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Match a processed housing trace against existing vehicle traces."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("index", help="Build or refresh build/vehicle_trace_index.json.")
+    query_parser = subparsers.add_parser("query", help="Rank existing vehicles by similarity to a trace SVG.")
+    query_parser.add_argument("trace", help="Refined trace.svg for the new vehicle (from refine_trace.py)")
+    query_parser.add_argument("--top", type=int, default=3)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = refresh_index()
+    if args.command == "index":
+        print(f"Indexed {len(index)} vehicle traces in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return
+
+    if not os.path.exists(args.trace):
+        print(f"Error: File not found {args.trace}")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    matches = rank(describe(args.trace), index, args.top)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if not matches:
+        print("No vehicle traces indexed; run the trace pipeline for at least one vehicle first.")
+        sys.exit(1)
+    for vehicle, distance, score in matches:
+        print(f"vehicle={vehicle} score={score:.3f} distance={distance:.4f}")
+    print(f"query_ms={elapsed_ms:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,29 +4,11 @@ import numpy as np
 import sys
 import os
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python process_annotation.py <image_path> [output_svg_path]")
-        sys.exit(1)
-
-    image_path = sys.argv[1]
-    if not os.path.exists(image_path):
-        print(f"Error: File not found {image_path}")
-        sys.exit(1)
-
-    if len(sys.argv) > 2:
-        output_svg_path = sys.argv[2]
-    else:
-        output_svg_path = os.path.join(os.path.dirname(image_path), "raw_trace.svg")
-    
-    print(f"Processing {image_path}...")
-    
-    # Read image
-    img = cv2.imread(image_path)
-    if img is None:
-        print("Error: Could not read image")
-        sys.exit(1)
+def extract_trace(img):
+    """Return (trace points in mm, pixels per mm) from an annotated BGR image.
 
+    Returns no points when the image has no magenta trace.
+    """
     # Convert to HSV
     hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
 
@@ -87,8 +69,7 @@ def main():
     contours_magenta, _ = cv2.findContours(mask_magenta, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
     
     if not contours_magenta:
-        print("Error: No Magenta trace found!")
-        sys.exit(1)
+        return [], pixels_per_mm
         
     # Combine all magenta contours or take largest?
     # Prompt implies "Draw a ... outline around the black plastic cover"
@@ -108,14 +89,18 @@ def main():
     for point in approx_curve:
         x, y = point[0]
         points_mm.append((x / pixels_per_mm, y / pixels_per_mm))
-        
+
+    return points_mm, pixels_per_mm
+
+
+def write_trace_svg(points_mm, image_shape, pixels_per_mm, output_svg_path):
     # Generate SVG content
     # ViewBox should cover the range. 
     # Let's offset so the top-left of the shape is near (0,0) or keep absolute?
     # Keeping absolute is safer for verifying against the image.
     
     # SVG size in mm
-    h, w, _ = img.shape
+    h, w = image_shape[:2]
     width_mm = w / pixels_per_mm
     height_mm = h / pixels_per_mm
     
@@ -138,8 +123,42 @@ def main():
 
     with open(output_svg_path, 'w') as f:
         f.write(svg_content)
-        
+
+
+def process_annotation(image_path, output_svg_path):
+    print(f"Processing {image_path}...")
+    
+    # Read image
+    img = cv2.imread(image_path)
+    if img is None:
+        print("Error: Could not read image")
+        sys.exit(1)
+
+    points_mm, pixels_per_mm = extract_trace(img)
+    if not points_mm:
+        print("Error: No Magenta trace found!")
+        sys.exit(1)
+
+    write_trace_svg(points_mm, img.shape, pixels_per_mm, output_svg_path)
     print(f"Saved trace to {output_svg_path}")
 
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python process_annotation.py <image_path> [output_svg_path]")
+        sys.exit(1)
+
+    image_path = sys.argv[1]
+    if not os.path.exists(image_path):
+        print(f"Error: File not found {image_path}")
+        sys.exit(1)
+
+    if len(sys.argv) > 2:
+        output_svg_path = sys.argv[2]
+    else:
+        output_svg_path = os.path.join(os.path.dirname(image_path), "raw_trace.svg")
+
+    process_annotation(image_path, output_svg_path)
+
 if __name__ == "__main__":
     main()
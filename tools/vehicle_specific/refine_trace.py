@@ -77,21 +77,11 @@ def get_intersections(y, points):
             
     return sorted(intersections)
 
-def main():
-    if len(sys.argv) < 2:
-        print("Usage: python refine_trace.py <input_svg_path>")
-        sys.exit(1)
-
-    input_path = sys.argv[1]
-    if not os.path.exists(input_path):
-        print(f"Error: File not found {input_path}")
-        sys.exit(1)
+def symmetrize_trace(points, num_slices=200):
+    """Rotate, center and symmetrize a raw trace by slicing it along Y.
 
-    output_path = os.path.join(os.path.dirname(input_path), "trace.svg")
-    
-    print(f"Reading {input_path}...")
-    points = parse_svg_path_points(input_path)
-    
+    Returns an empty array when no slice crosses the trace.
+    """
     # 1. Rotate 180 degrees and Center
     centroid = np.mean(points, axis=0)
     centered_points = points - centroid
@@ -105,7 +95,6 @@ def main():
     # 2. Geometric Slicing
     # Step through Y indices
     # We want a smooth curve, so high resolution
-    num_slices = 200
     y_levels = np.linspace(min_y, max_y, num_slices)
     
     left_profile = []
@@ -150,10 +139,30 @@ def main():
     final_points_right = np.array(right_profile)[::-1] # Reverse right side
     
     if len(final_points_left) == 0:
-         print("Error: No valid intersections found.")
-         sys.exit(1)
+        return final_points_left
+
+    return np.concatenate([final_points_left, final_points_right])
+
 
-    final_points = np.concatenate([final_points_left, final_points_right])
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python refine_trace.py <input_svg_path>")
+        sys.exit(1)
+
+    input_path = sys.argv[1]
+    if not os.path.exists(input_path):
+        print(f"Error: File not found {input_path}")
+        sys.exit(1)
+
+    output_path = os.path.join(os.path.dirname(input_path), "trace.svg")
+    
+    print(f"Reading {input_path}...")
+    points = parse_svg_path_points(input_path)
+    
+    final_points = symmetrize_trace(points)
+    if len(final_points) == 0:
+        print("Error: No valid intersections found.")
+        sys.exit(1)
 
     # 3. Save
     write_svg(final_points, output_path)
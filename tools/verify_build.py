@@ -7,27 +7,24 @@
 # ]
 # ///
 
+import argparse
+import asyncio
+import glob
+import hashlib
 import os
+import random
+import sqlite3
 import sys
-import glob
+import time
 from google import genai
+from google.genai import types
 from PIL import Image
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
 
-def verify_image(client, image_path):
-    model_id = "gemini-3-flash-preview" 
-
-    print(f"Analyzing {image_path} using {model_id}...")
-    
-    try:
-        image = Image.open(image_path)
-    except Exception as e:
-        print(f"Error opening image: {e}")
-        return False
-
-    prompt = """
+MODEL_ID = "gemini-3-flash-preview"
+PROMPT = """
     Analyze this mounting template image.
     1. Are there RED DASHED LINES indicating a clearance zone? (They should be shaped like a camera cover trace).
     2. Is there a "Vehicle's Original Camera Housing" label?
@@ -37,20 +34,128 @@ def verify_image(client, image_path):
     Answer YES or NO for each, and provide a short summary.
     If any of these are NO, say "FAIL". Otherwise "PASS".
     """
+# Any edit to the prompt invalidates earlier verdicts.
+PROMPT_VERSION = hashlib.sha256(PROMPT.encode()).hexdigest()[:16]
+CACHE_PATH = os.path.join("build", "verify_cache.sqlite")
+MAX_CONCURRENCY = 10
+MAX_ATTEMPTS = 5
 
-    try:
-        response = client.models.generate_content(
-            model=model_id,
-            contents=[image, prompt]
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def open_cache(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path)
+    db.execute(
+        """
+        CREATE TABLE IF NOT EXISTS verdicts (
+            image_sha256 TEXT NOT NULL,
+            model TEXT NOT NULL,
+            prompt_version TEXT NOT NULL,
+            passed INTEGER NOT NULL,
+            report TEXT NOT NULL,
+            path TEXT NOT NULL,
+            verified_at REAL NOT NULL,
+            PRIMARY KEY (image_sha256, model, prompt_version)
         )
-        report = response.text.strip()
-        print(f"Gemini Report:\n{report}")
-        return "PASS" in report
-    except Exception as e:
-        print(f"Error during generation: {e}")
-        return False
+        """
+    )
+    return db
+
+
+def cached_verdict(db, digest):
+    return db.execute(
+        "SELECT passed, report FROM verdicts WHERE image_sha256 = ? AND model = ? AND prompt_version = ?",
+        (digest, MODEL_ID, PROMPT_VERSION),
+    ).fetchone()
+
+
+def store_verdict(db, digest, image_path, passed, report):
+    db.execute(
+        "INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (digest, MODEL_ID, PROMPT_VERSION, int(passed), report, image_path, time.time()),
+    )
+    db.commit()
+
+
+async def verify_image(client, semaphore, image_path):
+    # The image is only opened once a slot is free, so at most
+    # MAX_CONCURRENCY files are open however many are pending.
+    async with semaphore:
+        try:
+            image = Image.open(image_path)
+        except Exception as e:
+            print(f"Error opening image: {e}")
+            return False, None
+
+        with image:
+            print(f"Analyzing {image_path} using {MODEL_ID}...")
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                try:
+                    response = await client.aio.models.generate_content(
+                        model=MODEL_ID,
+                        contents=[image, PROMPT]
+                    )
+                    break
+                except Exception as e:
+                    if attempt == MAX_ATTEMPTS:
+                        print(f"Error during generation for {image_path}: {e}")
+                        return False, None
+                    # Exponential backoff with jitter for rate limits and transient errors.
+                    delay = min(2 ** attempt, 30) + random.uniform(0, 1)
+                    print(f"Retrying {image_path} in {delay:.1f}s after error: {e}")
+                    await asyncio.sleep(delay)
+
+    # Blocked or empty candidates have no text; report them as an error for
+    # this image rather than failing the whole batch.
+    if not response.text:
+        print(f"Empty response for {image_path}")
+        return False, None
+    report = response.text.strip()
+    print(f"Gemini Report for {image_path}:\n{report}")
+    return "PASS" in report, report
+
+
+async def verify_all(client, db, files_to_check, refresh):
+    failed = []
+    pending = []
+    for f in files_to_check:
+        digest = file_sha256(f)
+        cached = None if refresh else cached_verdict(db, digest)
+        if cached is None:
+            pending.append((f, digest))
+            continue
+        passed, _report = cached
+        print(f"Cached {'PASS' if passed else 'FAIL'} for {f}")
+        if not passed:
+            failed.append(f)
+
+    print(f"Verifying {len(pending)} of {len(files_to_check)} files ({len(files_to_check) - len(pending)} cached)...")
+
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+
+    async def check(f, digest):
+        return f, digest, await verify_image(client, semaphore, f)
+
+    for future in asyncio.as_completed([check(f, digest) for f, digest in pending]):
+        f, digest, (passed, report) = await future
+        # Errors are not cached so the next run retries them.
+        if report is not None:
+            store_verdict(db, digest, f, passed, report)
+        if not passed:
+            failed.append(f)
+    return failed
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Verify rendered template PNGs with Gemini.")
+    parser.add_argument("files", nargs="*", help="PNGs to verify. Defaults to every color PNG under build/.")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached verdicts and re-submit every image.")
+    args = parser.parse_args()
+
     # Standard setup from AGENTS.md
     os.environ.setdefault("GOOGLE_GENAI_USE_VERTEXAI", "True")
     if os.environ.get("GOOGLE_GENAI_USE_VERTEXAI") != "True":
@@ -61,15 +166,18 @@ def main():
         raise SystemExit("GOOGLE_CLOUD_PROJECT is required for Vertex AI verification.")
 
     print("Using Vertex AI...")
+    # VERIFY_BASE_URL points the client at a local stand-in server when testing.
+    base_url = os.environ.get("VERIFY_BASE_URL")
     client = genai.Client(
         vertexai=True,
         project=project,
-        location="global"
+        location="global",
+        http_options=types.HttpOptions(base_url=base_url) if base_url else None,
     )
 
     files_to_check = []
-    if len(sys.argv) > 1:
-        files_to_check = sys.argv[1:]
+    if args.files:
+        files_to_check = args.files
     else:
         # Check all build PNGs if no args
         base_dir = "build"
@@ -86,24 +194,14 @@ def main():
         print("No files found to verify.")
         sys.exit(0)
 
-    print(f"Verifying {len(files_to_check)} files in parallel...")
-    
-    import concurrent.futures
+    db = open_cache(CACHE_PATH)
+    try:
+        failed = asyncio.run(verify_all(client, db, files_to_check, args.refresh))
+    finally:
+        db.close()
 
-    failed = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_file = {executor.submit(verify_image, client, f): f for f in files_to_check}
-        for future in concurrent.futures.as_completed(future_to_file):
-            f = future_to_file[future]
-            try:
-                if not future.result():
-                    failed.append(f)
-            except Exception as exc:
-                print(f"{f} generated an exception: {exc}")
-                failed.append(f)
-    
     if failed:
-        print(f"\nVerification FAILED for: {failed}")
+        print(f"\nVerification FAILED for: {sorted(failed)}")
         sys.exit(1)
     else:
         print("\nAll checks PASSED.")